@@ -0,0 +1,556 @@
+"""
+Cassandra/cassandra_aio.py
+Versión asyncio de las consultas de Cassandra/cassandra_queries.py.
+
+Cada función tiene la misma firma y el mismo resultado que su versión
+síncrona, pero es una corrutina: los ResponseFuture de
+session.execute_async se convierten en futures de asyncio, así miles de
+consultas concurrentes comparten un solo event loop sin hilos extra.
+
+    rows = await cassandra_aio.get_recent_transactions(session, "ACC12345")
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from cassandra import InvalidRequest
+from cassandra.cluster import EXEC_PROFILE_DEFAULT
+from cassandra.protocol import PreparedQueryNotFound
+
+from Cassandra.cassandra_columnar import count_rows, execution_profile_for, finish_rows
+from Cassandra.cassandra_queries import (
+    INSERT_ALERT,
+    INSERT_ALERT_BY_ACCOUNT,
+    INSERT_ALERT_BY_TIME,
+    INSERT_DAILY_ACTIVE_ACCOUNT,
+    INSERT_TRANSACTION,
+    INSERT_TRANSACTION_BY_ID,
+    INSERT_TRANSACTION_PAYLOAD,
+    RECENT_MAX_BUCKETS,
+    SELECT_DAILY_TOTAL,
+    SELECT_DAILY_TOTALS_COUNTERS,
+    SELECT_LATEST_ALERTS,
+    SELECT_RECENT_TRANSACTIONS,
+    SELECT_TRANSACTION_BY_ID,
+    SELECT_TRANSACTION_PAYLOAD,
+    SELECT_TRANSACTIONS_BY_BUCKET,
+    SELECT_TRANSACTIONS_IN_RANGE,
+    SELECT_MERCHANT_DAILY_TOTALS,
+    SELECT_MERCHANT_DAILY_TOTALS_V1,
+    UPDATE_DAILY_TOTALS_COUNTERS,
+    UPDATE_MERCHANT_DAILY_TOTALS,
+    _alert_dict,
+    _daily_totals_dict,
+    _merchant_series,
+    _range_params,
+    _recent_buckets,
+    _recent_params,
+    _transaction_by_id_dict,
+    _transaction_dict,
+    alert_batch,
+    alerts_by_account_query,
+    counter_statements,
+    daily_totals_keys,
+    decode_paging_state,
+    encode_paging_state,
+    month_bucket,
+    month_buckets,
+    new_transaction_row,
+    notify_daily_totals_write,
+    previous_bucket,
+    transaction_batch
+)
+from Cassandra.cassandra_payloads import decode_payload
+from Cassandra.cassandra_statements import get_registry, is_stale_statement_error, prepare, prepared_or_none
+
+
+# Sentencias que usan transaction_batch y counter_statements (se preparan
+# sin bloquear el loop)
+TRANSACTION_WRITES = (
+    INSERT_TRANSACTION,
+    INSERT_TRANSACTION_BY_ID,
+    INSERT_DAILY_ACTIVE_ACCOUNT,
+    INSERT_TRANSACTION_PAYLOAD,
+    UPDATE_DAILY_TOTALS_COUNTERS,
+    UPDATE_MERCHANT_DAILY_TOTALS
+)
+
+
+# ============================================================
+# ================ ResponseFuture -> asyncio =================
+# ============================================================
+
+class AsyncResult(object):
+    """
+    Resultado paginado de una consulta asíncrona.
+
+    Cada página que entrega el driver se pasa al event loop con
+    call_soon_threadsafe; la siguiente página solo se pide cuando se
+    consume la actual.
+    """
+
+    def __init__(self, response_future, loop):
+        self._response_future = response_future
+        self._loop = loop
+        self._pages = asyncio.Queue()
+        self._ready = None
+        response_future.add_callbacks(callback=self._on_page, errback=self._on_error)
+
+    def _on_page(self, rows):
+        self._loop.call_soon_threadsafe(self._pages.put_nowait, (rows, None))
+
+    def _on_error(self, error):
+        self._loop.call_soon_threadsafe(self._pages.put_nowait, (None, error))
+
+    @property
+    def has_more_pages(self):
+        return self._response_future.has_more_pages
+
+    @property
+    def paging_state(self):
+        return self._response_future._paging_state
+
+    async def ready(self):
+        """
+        Espera a que llegue la primera página (o el error) sin consumirla.
+        """
+        if self._ready is None:
+            self._ready = await self._pages.get()
+        if self._ready[1] is not None:
+            raise self._ready[1]
+        return self
+
+    async def next_page(self):
+        """
+        Espera la página actual y la devuelve (lista de filas).
+        """
+        if self._ready is not None:
+            (rows, error), self._ready = self._ready, None
+        else:
+            rows, error = await self._pages.get()
+        if error is not None:
+            raise error
+        return rows
+
+    def fetch_next_page(self):
+        self._response_future.start_fetching_next_page()
+
+    async def one(self):
+        rows = await self.next_page()
+        return rows[0] if rows else None
+
+    async def all(self):
+        results = []
+        async for row in self:
+            results.append(row)
+        return results
+
+    async def __aiter__(self):
+        while True:
+            for row in await self.next_page():
+                yield row
+            if not self.has_more_pages:
+                return
+            self.fetch_next_page()
+
+
+async def prepare_async(session, query):
+    """
+    Igual que cassandra_statements.prepare, pero la primera preparación
+    (bloqueante) se hace en un hilo del executor.
+    """
+    statement = prepared_or_none(session, query)
+    if statement is None:
+        loop = asyncio.get_running_loop()
+        statement = await loop.run_in_executor(None, prepare, session, query)
+    return statement
+
+
+def submit(session, statement, **kwargs):
+    """
+    Envía la sentencia con execute_async y devuelve su AsyncResult.
+    """
+    loop = asyncio.get_running_loop()
+    return AsyncResult(session.execute_async(statement, **kwargs), loop)
+
+
+async def execute(session, query, params=(), fetch_size=None, paging_state=None,
+                  execution_profile=EXEC_PROFILE_DEFAULT):
+    """
+    Versión asíncrona de cassandra_statements.execute. Devuelve el
+    AsyncResult cuando ya llegó su primera página.
+    """
+    for attempt in (1, 2):
+        statement = (await prepare_async(session, query)).bind(params)
+        if fetch_size is not None:
+            statement.fetch_size = fetch_size
+        result = submit(session, statement, paging_state=paging_state,
+                        execution_profile=execution_profile)
+        try:
+            return await result.ready()
+        except (InvalidRequest, PreparedQueryNotFound) as e:
+            if attempt == 2 or not is_stale_statement_error(e):
+                raise
+            get_registry(session).invalidate(query)
+
+
+async def _gather(futures):
+    return await asyncio.gather(*futures)
+
+
+# ============================================================
+# ========================= CONSULTAS ========================
+# ============================================================
+
+#  1. Insertar una transacción en transaction_history
+async def insert_transaction(session, account_number, amount, currency, merchant, status, raw_payload=""):
+    """
+    Versión asíncrona de cassandra_queries.insert_transaction.
+    """
+    tx = new_transaction_row(account_number, amount, currency, merchant, status)
+
+    try:
+        for query in TRANSACTION_WRITES:
+            await prepare_async(session, query)
+        await submit(session, transaction_batch(session, tx, raw_payload)).next_page()
+    except Exception as e:
+        print(f"Error insertando transacción: {e}")
+        return None
+
+    result = {"transaction_id": tx.transaction_id, "timestamp": tx.timestamp, "counters_applied": True}
+    try:
+        await _gather([
+            submit(session, statement).next_page()
+            for statement in counter_statements(session, tx)
+        ])
+    except Exception as e:
+        print(f"Transacción {tx.transaction_id} insertada, pero falló la actualización de contadores: {e}")
+        result["counters_applied"] = False
+        result["counters_error"] = str(e)
+    notify_daily_totals_write(tx.account_number, tx.timestamp.date())
+    return result
+
+
+#  2. Obtener transacciones recientes por cuenta
+async def get_recent_transactions(session, account_number, limit=20, max_buckets=RECENT_MAX_BUCKETS,
+                                  result_mode="dict"):
+    """
+    Versión asíncrona de cassandra_queries.get_recent_transactions.
+    """
+    profile = execution_profile_for(session, result_mode)
+    items = []
+    try:
+        found = 0
+        bucket = month_bucket(datetime.utcnow())
+        for _ in range(max_buckets):
+            result = await execute(session, SELECT_RECENT_TRANSACTIONS, (account_number, bucket, limit - found),
+                                   execution_profile=profile)
+            async for item in result:
+                items.append(item)
+                found += count_rows(item, result_mode)
+            if found >= limit:
+                break
+            bucket = previous_bucket(bucket)
+        return finish_rows(items, result_mode, _transaction_dict)
+    except Exception as e:
+        print(f"Error en get_recent_transactions: {e}")
+        return finish_rows([], result_mode, _transaction_dict)
+
+
+#  3. Obtener transacciones en un rango de fechas
+async def get_transactions_in_range(session, account_number, start_ts, end_ts, result_mode="dict"):
+    """
+    Versión asíncrona de cassandra_queries.get_transactions_in_range
+    (un bucket mensual por consulta, todas concurrentes).
+    """
+    profile = execution_profile_for(session, result_mode)
+
+    async def fetch(bucket):
+        result = await execute(session, SELECT_TRANSACTIONS_IN_RANGE,
+                               (account_number, bucket, start_ts, end_ts),
+                               execution_profile=profile)
+        return await result.all()
+
+    try:
+        pages = await _gather([fetch(bucket) for bucket in month_buckets(start_ts, end_ts)])
+        items = [item for page in pages for item in page]
+        return finish_rows(items, result_mode, _transaction_dict)
+    except Exception as e:
+        print(f"Error en get_transactions_in_range: {e}")
+        return finish_rows([], result_mode, _transaction_dict)
+
+
+#  4. Obtener totales diarios de una cuenta
+async def get_daily_totals(session, account_number, day_date):
+    """
+    Versión asíncrona de cassandra_queries.get_daily_totals.
+    """
+    try:
+        row = await (await execute(session, SELECT_DAILY_TOTAL, (account_number, day_date))).one()
+        if row:
+            return _daily_totals_dict(account_number, day_date, row)
+        row = await (await execute(session, SELECT_DAILY_TOTALS_COUNTERS, (account_number, day_date))).one()
+        if row:
+            return _daily_totals_dict(account_number, day_date, row, from_counters=True)
+        return None
+    except Exception as e:
+        print(f"Error en get_daily_totals: {e}")
+        return None
+
+
+#  5. Insertar alerta de fraude
+async def insert_alert(session, account_number, transaction_id, reason):
+    """
+    Versión asíncrona de cassandra_queries.insert_alert.
+    """
+    alert_id = uuid.uuid4()
+    now = datetime.utcnow()
+
+    try:
+        for query in (INSERT_ALERT, INSERT_ALERT_BY_ACCOUNT, INSERT_ALERT_BY_TIME):
+            await prepare_async(session, query)
+        batch = alert_batch(session, alert_id, now, account_number, transaction_id, reason)
+        await submit(session, batch).next_page()
+        return {"alert_id": alert_id, "timestamp": now}
+    except Exception as e:
+        print(f"Error insertando alerta: {e}")
+        return None
+
+
+#  6. Obtener alertas por cuenta
+async def get_alerts_by_account(session, account_number, start_ts=None, end_ts=None, limit=None):
+    """
+    Versión asíncrona de cassandra_queries.get_alerts_by_account.
+    """
+    query, params = alerts_by_account_query(account_number, start_ts, end_ts, limit)
+
+    try:
+        result = await execute(session, query, params)
+        return [_alert_dict(row) async for row in result]
+    except Exception as e:
+        print(f"Error en get_alerts_by_account: {e}")
+        return []
+
+
+#  7. Obtener últimas N alertas globales
+async def get_latest_alerts(session, limit=20, max_days=30):
+    """
+    Versión asíncrona de cassandra_queries.get_latest_alerts.
+    """
+    try:
+        results = []
+        day = datetime.utcnow().date()
+        for _ in range(max_days):
+            result = await execute(session, SELECT_LATEST_ALERTS, (day, limit - len(results)))
+            results.extend(_alert_dict(row) for row in await result.all())
+            if len(results) >= limit:
+                break
+            day -= timedelta(days=1)
+        return results
+    except Exception as e:
+        print(f"Error en get_latest_alerts: {e}")
+        return []
+
+
+#  7.1 Obtener el payload original de una transacción
+async def get_transaction_payload(session, transaction_id):
+    """
+    Versión asíncrona de cassandra_queries.get_transaction_payload.
+    """
+    try:
+        row = await (await execute(session, SELECT_TRANSACTION_PAYLOAD, (transaction_id,))).one()
+        return decode_payload(row.payload) if row else None
+    except Exception as e:
+        print(f"Error en get_transaction_payload: {e}")
+        return None
+
+
+#  7.2 Resolver transacciones por transaction_id
+async def get_transaction_by_id(session, transaction_id):
+    """
+    Versión asíncrona de cassandra_queries.get_transaction_by_id.
+    """
+    try:
+        row = await (await execute(session, SELECT_TRANSACTION_BY_ID, (transaction_id,))).one()
+        return _transaction_by_id_dict(row) if row else None
+    except Exception as e:
+        print(f"Error en get_transaction_by_id: {e}")
+        return None
+
+
+async def get_transactions_by_ids(session, transaction_ids, concurrency=100):
+    """
+    Versión asíncrona de cassandra_queries.get_transactions_by_ids.
+    """
+    transaction_ids = list(transaction_ids)
+    window = asyncio.Semaphore(concurrency)
+
+    async def fetch(transaction_id):
+        async with window:
+            return await get_transaction_by_id(session, transaction_id)
+
+    rows = await _gather([fetch(transaction_id) for transaction_id in transaction_ids])
+    return dict(zip(transaction_ids, rows))
+
+
+#  7.3 Serie diaria de un comercio
+async def get_merchant_daily_totals(session, merchant, start_day, end_day):
+    """
+    Versión asíncrona de cassandra_queries.get_merchant_daily_totals.
+    """
+    async def fetch(query, bucket):
+        result = await execute(session, query, (merchant, bucket, start_day, end_day))
+        return await result.all()
+
+    try:
+        pages = await _gather([
+            fetch(query, bucket)
+            for bucket in month_buckets(start_day, end_day)
+            for query in (SELECT_MERCHANT_DAILY_TOTALS, SELECT_MERCHANT_DAILY_TOTALS_V1)
+        ])
+        return _merchant_series(merchant, (row for page in pages for row in page))
+    except Exception as e:
+        print(f"Error en get_merchant_daily_totals: {e}")
+        return []
+
+
+#  8. Recorrido por páginas de transacciones
+
+async def _iter_buckets(session, query, buckets, params, fetch_size):
+    for bucket in buckets:
+        result = await execute(session, query, params(bucket), fetch_size=fetch_size)
+        async for row in result:
+            yield _transaction_dict(row)
+
+
+async def _fetch_page(session, query, buckets, params, page_size, paging_state):
+    driver_state = None
+    if paging_state is not None:
+        bucket, driver_state, _oldest_bucket = decode_paging_state(paging_state)
+        buckets = buckets[buckets.index(bucket):] if bucket in buckets else []
+    if not buckets:
+        return [], None
+    oldest_bucket = buckets[-1]
+
+    rows = []
+    for position, bucket in enumerate(buckets):
+        result = await execute(session, query, params(bucket),
+                               fetch_size=page_size - len(rows), paging_state=driver_state)
+        driver_state = None
+        rows.extend(_transaction_dict(row) for row in await result.next_page())
+
+        if result.paging_state is not None:
+            return rows, encode_paging_state(bucket, result.paging_state, oldest_bucket)
+        if len(rows) >= page_size:
+            remaining = buckets[position + 1:]
+            return rows, encode_paging_state(remaining[0], None, oldest_bucket) if remaining else None
+    return rows, None
+
+
+def iter_transactions_in_range(session, account_number, start_ts, end_ts, fetch_size=500):
+    """
+    Generador asíncrono (async for) de las transacciones de una cuenta
+    entre start_ts y end_ts.
+    """
+    return _iter_buckets(
+        session, SELECT_TRANSACTIONS_IN_RANGE, month_buckets(start_ts, end_ts),
+        _range_params(account_number, start_ts, end_ts), fetch_size
+    )
+
+
+def iter_recent_transactions(session, account_number, fetch_size=500, max_buckets=RECENT_MAX_BUCKETS):
+    """
+    Generador asíncrono de las transacciones de una cuenta, de la más
+    reciente a la más antigua.
+    """
+    return _iter_buckets(
+        session, SELECT_TRANSACTIONS_BY_BUCKET, _recent_buckets(max_buckets),
+        _recent_params(account_number), fetch_size
+    )
+
+
+async def page_transactions_in_range(session, account_number, start_ts, end_ts,
+                                     page_size=100, paging_state=None):
+    """
+    Versión asíncrona de cassandra_queries.page_transactions_in_range.
+    """
+    return await _fetch_page(
+        session, SELECT_TRANSACTIONS_IN_RANGE, month_buckets(start_ts, end_ts),
+        _range_params(account_number, start_ts, end_ts), page_size, paging_state
+    )
+
+
+async def page_recent_transactions(session, account_number, page_size=100, paging_state=None,
+                                   max_buckets=RECENT_MAX_BUCKETS):
+    """
+    Versión asíncrona de cassandra_queries.page_recent_transactions.
+    """
+    return await _fetch_page(
+        session, SELECT_TRANSACTIONS_BY_BUCKET, _recent_buckets(max_buckets, paging_state),
+        _recent_params(account_number), page_size, paging_state
+    )
+
+
+#  9. Lecturas de muchas cuentas a la vez
+async def _read_many(keys, fetch, concurrency):
+    """
+    Ejecuta fetch(clave) para cada clave con hasta `concurrency` en vuelo.
+    Devuelve (resultados, errores) por clave.
+    """
+    keys = list(keys)
+    window = asyncio.Semaphore(concurrency)
+
+    async def bounded(key):
+        async with window:
+            return await fetch(key)
+
+    outcomes = await asyncio.gather(*[bounded(key) for key in keys], return_exceptions=True)
+    results, errors = {}, {}
+    for key, outcome in zip(keys, outcomes):
+        if isinstance(outcome, Exception):
+            errors[key] = outcome
+        else:
+            results[key] = outcome
+    return results, errors
+
+
+async def get_recent_transactions_many(session, account_numbers, limit=20, max_buckets=RECENT_MAX_BUCKETS,
+                                       concurrency=100):
+    """
+    Versión asíncrona de cassandra_queries.get_recent_transactions_many
+    (cada cuenta recorre sus buckets de forma independiente).
+    """
+    async def fetch(account_number):
+        rows = []
+        bucket = month_bucket(datetime.utcnow())
+        for _ in range(max_buckets):
+            result = await execute(session, SELECT_RECENT_TRANSACTIONS,
+                                   (account_number, bucket, limit - len(rows)))
+            rows.extend(_transaction_dict(row) for row in await result.all())
+            if len(rows) >= limit:
+                break
+            bucket = previous_bucket(bucket)
+        return rows
+
+    return await _read_many(account_numbers, fetch, concurrency)
+
+
+async def get_daily_totals_many(session, account_numbers, day_dates, concurrency=100):
+    """
+    Versión asíncrona de cassandra_queries.get_daily_totals_many.
+    """
+    async def fetch(key):
+        account_number, day_date = key
+        row = await (await execute(session, SELECT_DAILY_TOTAL, (account_number, day_date))).one()
+        if row:
+            return _daily_totals_dict(account_number, day_date, row)
+        row = await (await execute(session, SELECT_DAILY_TOTALS_COUNTERS, (account_number, day_date))).one()
+        return _daily_totals_dict(account_number, day_date, row, from_counters=True) if row else None
+
+    keys, single = daily_totals_keys(account_numbers, day_dates)
+    results, errors = await _read_many(keys, fetch, concurrency)
+    if single:
+        results = {key[0]: value for key, value in results.items()}
+        errors = {key[0]: value for key, value in errors.items()}
+    return results, errors
@@ -0,0 +1,391 @@
+"""
+Cassandra/cassandra_bulk.py
+Ingesta masiva de transacciones en transaction_history_v2.
+
+insert_transactions_bulk recorre un iterable de transacciones, las agrupa
+por partición (account_number, month_bucket) en batches UNLOGGED pequeños
+y mantiene un número acotado de peticiones en vuelo con execute_async.
+
+Uso como CLI (un proceso por worker, una sesión por proceso):
+
+    python -m Cassandra.cassandra_bulk data/tx_2024.jsonl data/tx_2025.csv --workers 8
+"""
+
+import argparse
+import csv
+import json
+import os
+import threading
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from itertools import islice
+
+from cassandra.query import BatchStatement, BatchType
+
+from Cassandra.cassandra_queries import (
+    INSERT_TRANSACTION,
+    daily_totals_statements,
+    encoded_payload_statement,
+    merchant_totals_statement,
+    new_transaction_row,
+    notify_daily_totals_write,
+    to_minor_units,
+    transaction_by_id_statement
+)
+from Cassandra.cassandra_payloads import encode_payload
+from Cassandra.cassandra_statements import prepare
+
+
+REQUIRED_FIELDS = ("account_number", "amount", "currency", "merchant", "status")
+
+
+def normalize_transaction(tx):
+    """
+    Convierte un dict de entrada (JSON/CSV) en la TransactionRow que se
+    inserta. timestamp, transaction_id y raw_payload son opcionales.
+    """
+    missing = [f for f in REQUIRED_FIELDS if tx.get(f) in (None, "")]
+    if missing:
+        raise ValueError(f"Faltan campos: {', '.join(missing)}")
+
+    ts = tx.get("timestamp") or None
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+
+    tx_id = tx.get("transaction_id") or None
+    if isinstance(tx_id, str):
+        tx_id = uuid.UUID(tx_id)
+
+    return new_transaction_row(
+        str(tx["account_number"]),
+        tx["amount"],
+        tx["currency"],
+        tx["merchant"],
+        tx["status"],
+        timestamp=ts,
+        transaction_id=tx_id
+    )
+
+
+class _InFlight(object):
+    """
+    Control de peticiones asíncronas en vuelo y del resultado de la carga.
+    """
+
+    def __init__(self, concurrency, on_error):
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        # Incluye los followups en cola, no solo los enviados
+        self._pending = 0
+        self._followups = deque()
+        self._on_error = on_error
+        self.inserted = 0
+        self.failed = []
+        self.secondary_failures = []
+
+    def submit(self, session, batch, rows, followups=()):
+        """
+        Envía el batch; si se escribe, sus followups (agregados y payloads)
+        quedan en cola. La cola se envía desde el hilo que llama a submit o
+        wait, no desde el callback del driver, y cada sentencia ocupa un
+        lugar en la ventana como cualquier batch.
+        """
+        self._send_followups()
+        self._slots.acquire()
+        with self._lock:
+            self._pending += 1
+        try:
+            future = session.execute_async(batch)
+        except Exception as e:
+            self._done(rows, e)
+            return
+        future.add_callbacks(
+            callback=self._on_success, callback_args=(session, rows, followups),
+            errback=self._on_failure, errback_args=(rows,)
+        )
+
+    def fail(self, tx, error):
+        with self._lock:
+            self._record_failure(tx, error)
+
+    def _on_success(self, _result, session, rows, followups):
+        with self._lock:
+            self._pending += len(followups)
+            self._followups.extend((session, key, statement) for key, statement in followups)
+            if followups:
+                self._idle.notify_all()
+        self._done(rows, None)
+
+    def _send_followups(self):
+        while True:
+            with self._lock:
+                if not self._followups:
+                    return
+                session, key, statement = self._followups.popleft()
+            self._slots.acquire()
+            try:
+                future = session.execute_async(statement)
+            except Exception as e:
+                self._followup_done(None, key, e)
+                continue
+            future.add_callbacks(
+                callback=self._followup_done, callback_args=(key, None),
+                errback=self._followup_failed, errback_args=(key,)
+            )
+
+    def _followup_failed(self, error, key):
+        self._followup_done(None, key, error)
+
+    def _followup_done(self, _result, key, error):
+        with self._lock:
+            if error is not None:
+                self.secondary_failures.append(dict(key, error=str(error)))
+            elif key["table"] == "daily_totals_counters":
+                notify_daily_totals_write(key["account_number"], key["date"])
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+        self._slots.release()
+
+    def _on_failure(self, error, rows):
+        self._done(rows, error)
+
+    def _done(self, rows, error):
+        with self._lock:
+            if error is None:
+                self.inserted += len(rows)
+            else:
+                for tx in rows:
+                    self._record_failure(tx, error)
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+        self._slots.release()
+
+    def _record_failure(self, tx, error):
+        if self._on_error is not None:
+            self._on_error(tx, error)
+        else:
+            self.failed.append({"transaction": tx, "error": str(error)})
+
+    def wait(self):
+        while True:
+            self._send_followups()
+            with self._lock:
+                if not self._pending:
+                    return
+                if not self._followups:
+                    self._idle.wait()
+
+
+def followup_statements(session, group):
+    """
+    Escrituras secundarias de un grupo de filas ya escritas de una misma
+    partición: una actualización de contadores por día y por (comercio,
+    día, estado) (agregadas), el índice por transaction_id de cada fila y
+    el payload si lo trae. `group` es una lista de (tx, fila, payload
+    codificado o None).
+    """
+    account_number = group[0][1].account_number
+    by_day = defaultdict(lambda: [0, 0])
+    by_merchant = defaultdict(lambda: [0, 0])
+    for _tx, row, _payload in group:
+        amount_minor = to_minor_units(row.amount)
+        totals = by_day[row.timestamp.date()]
+        totals[0] += amount_minor
+        totals[1] += 1
+        if row.merchant:
+            totals = by_merchant[(row.merchant, row.timestamp.date(), row.status)]
+            totals[0] += amount_minor
+            totals[1] += 1
+
+    statements = []
+    for day, (amount_minor, count) in by_day.items():
+        key = {"table": "daily_totals_counters", "account_number": account_number, "date": day}
+        for statement in daily_totals_statements(session, account_number, day, amount_minor, count):
+            statements.append((key, statement))
+
+    for (merchant, day, status), (amount_minor, count) in by_merchant.items():
+        key = {"table": "merchant_daily_totals", "merchant": merchant, "date": day, "status": status}
+        statements.append((key, merchant_totals_statement(session, merchant, day, status, amount_minor, count)))
+
+    for _tx, row, payload in group:
+        key = {"table": "transactions_by_id", "transaction_id": row.transaction_id}
+        statements.append((key, transaction_by_id_statement(session, row)))
+        if payload is not None:
+            key = {"table": "transaction_payloads", "transaction_id": row.transaction_id}
+            statements.append((key, encoded_payload_statement(session, row.transaction_id, payload)))
+    return statements
+
+
+def insert_transactions_bulk(session, transactions, concurrency=64, batch_size=20,
+                             chunk_size=1000, on_error=None):
+    """
+    Inserta un iterable de transacciones (dicts) en transaction_history_v2.
+
+    - Lee el iterable en bloques de chunk_size filas.
+    - Agrupa por partición (account_number, month_bucket) y envía batches UNLOGGED de hasta
+      batch_size filas (una sola partición por batch).
+    - Mantiene como máximo `concurrency` peticiones en vuelo, contando
+      batches y escrituras secundarias.
+    - Por cada batch escrito actualiza los contadores diarios, el índice
+      transactions_by_id y guarda los payloads comprimidos.
+
+    Un error en una fila no detiene la carga: se reporta en "failed"
+    (o se pasa a on_error(tx, error) si se indica). Los errores de las
+    escrituras secundarias se reportan en "secondary_failures".
+    Devuelve {"inserted": n, "failed": [...], "secondary_failures": [...]}.
+    """
+    statement = prepare(session, INSERT_TRANSACTION)
+    inflight = _InFlight(concurrency, on_error)
+    source = iter(transactions)
+
+    while True:
+        chunk = list(islice(source, chunk_size))
+        if not chunk:
+            break
+
+        by_partition = defaultdict(list)
+        for tx in chunk:
+            # Se valida, se enlaza y se codifica el payload de cada fila por
+            # separado: un tipo inválido (p. ej. currency numérico) o un
+            # payload no serializable falla aquí y no en el batch
+            try:
+                params = normalize_transaction(tx)
+                bound = statement.bind(params)
+                payload = encode_payload(tx["raw_payload"]) if tx.get("raw_payload") else None
+            except Exception as e:
+                inflight.fail(tx, e)
+                continue
+            by_partition[(params.account_number, params.month_bucket)].append((tx, params, payload, bound))
+
+        for rows in by_partition.values():
+            for start in range(0, len(rows), batch_size):
+                chunk_rows = rows[start:start + batch_size]
+                group = [(tx, params, payload) for tx, params, payload, _bound in chunk_rows]
+                batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+                for _tx, _params, _payload, bound in chunk_rows:
+                    batch.add(bound)
+                inflight.submit(
+                    session, batch, [tx for tx, _params, _payload in group],
+                    followup_statements(session, group)
+                )
+
+    inflight.wait()
+    return {
+        "inserted": inflight.inserted,
+        "failed": inflight.failed,
+        "secondary_failures": inflight.secondary_failures
+    }
+
+
+# ============================================================
+# ============================ CLI ===========================
+# ============================================================
+
+_worker_session = None
+
+
+def _init_worker():
+    """
+    Inicializa la sesión propia de cada proceso del pool.
+    """
+    global _worker_session
+    from connect import get_cassandra_session
+    _cluster, _worker_session = get_cassandra_session()
+
+
+def _ingest_chunk(rows, concurrency, batch_size):
+    return insert_transactions_bulk(
+        _worker_session, rows, concurrency=concurrency, batch_size=batch_size
+    )
+
+
+def read_transactions(path):
+    """
+    Lee transacciones de un archivo .jsonl (un objeto por línea) o .csv
+    (con encabezados).
+    """
+    with open(path, "r", newline="") as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield row
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def backfill(paths, workers, chunk_size, concurrency, batch_size, errors_path=None):
+    """
+    Reparte los archivos en bloques de chunk_size filas entre un pool de
+    procesos. Solo se mantienen 2 bloques pendientes por worker para no
+    cargar todo el archivo en memoria.
+    """
+    inserted = 0
+    failed = 0
+    errors_file = open(errors_path, "w") if errors_path else None
+
+    def collect(future):
+        nonlocal inserted, failed
+        result = future.result()
+        inserted += result["inserted"]
+        failed += len(result["failed"])
+        if errors_file:
+            for failure in result["failed"] + result["secondary_failures"]:
+                errors_file.write(json.dumps(failure, default=str) + "\n")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = set()
+            for path in paths:
+                source = read_transactions(path)
+                while True:
+                    chunk = list(islice(source, chunk_size))
+                    if not chunk:
+                        break
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future)
+                        print(f"Insertadas: {inserted}  Fallidas: {failed}")
+                    pending.add(pool.submit(_ingest_chunk, chunk, concurrency, batch_size))
+
+            for future in wait(pending).done:
+                collect(future)
+    finally:
+        if errors_file:
+            errors_file.close()
+
+    return {"inserted": inserted, "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Carga masiva de transacciones (JSONL/CSV) en transaction_history_v2."
+    )
+    parser.add_argument("paths", nargs="+", help="Archivos .jsonl o .csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64,
+                        help="Peticiones en vuelo por worker")
+    parser.add_argument("--batch-size", type=int, default=20,
+                        help="Filas por batch UNLOGGED (misma partición)")
+    parser.add_argument("--errors", help="Archivo JSONL para las filas fallidas")
+    args = parser.parse_args()
+
+    # Keyspace y tablas antes de lanzar los workers (clúster nuevo)
+    from connect import bootstrap_cassandra
+    bootstrap_cassandra()
+
+    result = backfill(args.paths, args.workers, args.chunk_size,
+                      args.concurrency, args.batch_size, args.errors)
+    print(f"Carga terminada. Insertadas: {result['inserted']}  Fallidas: {result['failed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Cassandra/cassandra_cache.py
+Caché de resultados de get_daily_totals.
+
+Un día ya congelado en daily_totals no vuelve a cambiar, así que su
+resultado se guarda sin vencimiento en una LRU acotada por número de
+entradas (y, opcionalmente, en un archivo sqlite local que sobrevive a
+reinicios). El día de hoy y los días aún no congelados se guardan con un
+TTL corto. Las escrituras de contadores (insert_transaction y la carga
+masiva) invalidan la entrada del día correspondiente.
+
+    cache = DailyTotalsCache(max_entries=100000, disk_path="daily_totals.sqlite")
+    cache.get_daily_totals(session, "ACC12345", date(2025, 11, 9))
+    cache.stats()  # {"hits": ..., "misses": ..., ...}
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+
+from Cassandra.cassandra_queries import (
+    add_daily_totals_listener,
+    read_daily_totals,
+    remove_daily_totals_listener
+)
+
+
+# Segundos que vive la entrada de hoy (o de un día aún no congelado)
+TODAY_TTL = 5.0
+
+DEFAULT_MAX_ENTRIES = 100000
+
+_NO_ENTRY = object()
+
+
+class _DiskStore(object):
+    """
+    Días congelados guardados en sqlite (solo se escriben entradas
+    permanentes).
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS daily_totals ("
+                " account_number TEXT, day TEXT, total_amount TEXT, transaction_count INTEGER,"
+                " PRIMARY KEY (account_number, day))"
+            )
+
+    def get(self, account_number, day_date):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT total_amount, transaction_count FROM daily_totals"
+                " WHERE account_number = ? AND day = ?",
+                (account_number, day_date.isoformat())
+            ).fetchone()
+        if row is None:
+            return _NO_ENTRY
+        return {
+            "account_number": account_number,
+            "date": day_date,
+            "total_amount": Decimal(row[0]),
+            "transaction_count": row[1]
+        }
+
+    def put(self, account_number, day_date, totals):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO daily_totals VALUES (?, ?, ?, ?)",
+                (account_number, day_date.isoformat(), str(totals["total_amount"]),
+                 totals["transaction_count"])
+            )
+
+    def delete(self, account_number, day_date):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM daily_totals WHERE account_number = ? AND day = ?",
+                (account_number, day_date.isoformat())
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DailyTotalsCache(object):
+    """
+    LRU de (account_number, día) -> totales delante de get_daily_totals.
+    Es segura entre hilos y se registra para recibir las invalidaciones
+    de las escrituras (close() la desregistra).
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, today_ttl=TODAY_TTL, disk_path=None):
+        self.max_entries = max_entries
+        self.today_ttl = today_ttl
+        self._entries = OrderedDict()  # clave -> (totales, vence o None)
+        self._lock = threading.Lock()
+        self._disk = _DiskStore(disk_path) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        add_daily_totals_listener(self.invalidate)
+
+    def get_daily_totals(self, session, account_number, day_date):
+        """
+        Igual que cassandra_queries.get_daily_totals, pero resuelto desde
+        la caché cuando es posible.
+        """
+        key = (account_number, day_date)
+        totals = self._lookup(key)
+        if totals is not _NO_ENTRY:
+            return totals
+
+        try:
+            totals, frozen = read_daily_totals(session, account_number, day_date)
+        except Exception as e:
+            print(f"Error en get_daily_totals: {e}")
+            return None
+
+        permanent = frozen and day_date < datetime.utcnow().date()
+        self._store(key, totals, permanent)
+        if permanent and self._disk is not None:
+            self._disk.put(account_number, day_date, totals)
+        return totals
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                totals, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return totals
+                del self._entries[key]
+
+        if self._disk is not None:
+            totals = self._disk.get(*key)
+            if totals is not _NO_ENTRY:
+                self._store(key, totals, True)
+                with self._lock:
+                    self.disk_hits += 1
+                return totals
+
+        with self._lock:
+            self.misses += 1
+        return _NO_ENTRY
+
+    def _store(self, key, totals, permanent):
+        expires = None if permanent else time.monotonic() + self.today_ttl
+        with self._lock:
+            self._entries[key] = (totals, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, account_number, day_date):
+        """
+        Descarta la entrada (account_number, day_date); la llaman las
+        escrituras de contadores.
+        """
+        if isinstance(day_date, datetime):
+            day_date = day_date.date()
+        with self._lock:
+            if self._entries.pop((account_number, day_date), None) is not None:
+                self.invalidations += 1
+        if self._disk is not None and day_date < datetime.utcnow().date():
+            self._disk.delete(account_number, day_date)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
+
+    def close(self):
+        remove_daily_totals_listener(self.invalidate)
+        if self._disk is not None:
+            self._disk.close()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """
+    Caché compartida del proceso (sin almacenamiento en disco).
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = DailyTotalsCache()
+        return _default_cache
+
+
+def get_daily_totals_cached(session, account_number, day_date):
+    """
+    get_daily_totals a través de la caché compartida del proceso.
+    """
+    return default_cache().get_daily_totals(session, account_number, day_date)
@@ -0,0 +1,178 @@
+"""
+Cassandra/cassandra_columnar.py
+Modos de resultado compactos para las lecturas de transacciones.
+
+- "dict" (por defecto): una lista de dicts, como siempre.
+- "record": una lista de TransactionRecord (objetos con __slots__).
+- "columnar": un TransactionColumns con un arreglo de NumPy por columna
+  (timestamps epoch en ms int64, montos en unidades menores int64 y
+  currency/merchant/status codificados como categorías).
+
+Los modos "record" y "columnar" se arman directamente en el row_factory
+del driver, sin crear un dict por fila.
+"""
+
+from decimal import ROUND_HALF_UP
+
+from cassandra.cluster import EXEC_PROFILE_DEFAULT
+
+
+RESULT_MODES = ("dict", "record", "columnar")
+
+TRANSACTION_COLUMNS = ("timestamp", "transaction_id", "amount", "currency", "merchant", "status")
+
+CATEGORICAL_COLUMNS = ("currency", "merchant", "status")
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("El modo de resultado 'columnar' requiere numpy (pip install numpy)")
+    return numpy
+
+
+class TransactionRecord(object):
+    """
+    Transacción ligera (sin dict por instancia).
+    """
+    __slots__ = TRANSACTION_COLUMNS
+
+    def __init__(self, timestamp, transaction_id, amount, currency, merchant, status):
+        self.timestamp = timestamp
+        self.transaction_id = transaction_id
+        self.amount = amount
+        self.currency = currency
+        self.merchant = merchant
+        self.status = status
+
+    def __repr__(self):
+        return f"TransactionRecord({self.transaction_id}, {self.timestamp}, {self.amount} {self.currency})"
+
+
+def record_factory(colnames, rows):
+    """
+    row_factory que devuelve TransactionRecord.
+    """
+    index = [colnames.index(name) for name in TRANSACTION_COLUMNS]
+    return [TransactionRecord(*[row[i] for i in index]) for row in rows]
+
+
+class ColumnChunk(object):
+    """
+    Columnas de una página de resultados, armadas en el row_factory.
+    Los categóricos quedan como arreglos de texto hasta combinar las páginas.
+    """
+    __slots__ = ("columns",)
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns["timestamp"])
+
+
+def columnar_factory(colnames, rows):
+    """
+    row_factory que convierte cada página en un solo ColumnChunk.
+    """
+    from Cassandra.cassandra_queries import MINOR_UNITS
+
+    np = _numpy()
+    if not rows:
+        return []
+
+    columns = list(zip(*rows))
+    by_name = dict(zip(colnames, columns))
+    amounts = [
+        int((amount * MINOR_UNITS).to_integral_value(rounding=ROUND_HALF_UP))
+        for amount in by_name["amount"]
+    ]
+
+    chunk = {
+        "timestamp": np.array(by_name["timestamp"], dtype="datetime64[ms]").astype(np.int64),
+        "transaction_id": np.array(by_name["transaction_id"], dtype=object),
+        "amount": np.array(amounts, dtype=np.int64),
+    }
+    for name in CATEGORICAL_COLUMNS:
+        chunk[name] = np.array(by_name[name], dtype=object)
+    # Columnas extra de la consulta (p. ej. account_number en la exportación)
+    for name in colnames:
+        if name not in chunk:
+            chunk[name] = np.array(by_name[name], dtype=object)
+    return [ColumnChunk(chunk)]
+
+
+class TransactionColumns(object):
+    """
+    Resultado columnar:
+    - timestamp: int64, milisegundos epoch (UTC)
+    - transaction_id: arreglo de UUID
+    - amount: int64, unidades menores (centavos)
+    - currency / merchant / status: códigos int32; el texto de cada código
+      está en categories[columna]
+    """
+    __slots__ = ("timestamp", "transaction_id", "amount",
+                 "currency", "merchant", "status", "categories")
+
+    def __init__(self, timestamp, transaction_id, amount, currency, merchant, status, categories):
+        self.timestamp = timestamp
+        self.transaction_id = transaction_id
+        self.amount = amount
+        self.currency = currency
+        self.merchant = merchant
+        self.status = status
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        np = _numpy()
+
+        def concat(name, dtype):
+            if not chunks:
+                return np.array([], dtype=dtype)
+            return np.concatenate([chunk.columns[name] for chunk in chunks])
+
+        columns = {
+            "timestamp": concat("timestamp", np.int64),
+            "transaction_id": concat("transaction_id", object),
+            "amount": concat("amount", np.int64),
+        }
+        categories = {}
+        for name in CATEGORICAL_COLUMNS:
+            values = concat(name, object)
+            labels, codes = np.unique(values.astype(str), return_inverse=True)
+            columns[name] = codes.astype(np.int32)
+            categories[name] = labels.tolist()
+        return cls(categories=categories, **columns)
+
+
+def execution_profile_for(session, result_mode):
+    """
+    Perfil de ejecución con el row_factory del modo pedido.
+    """
+    if result_mode not in RESULT_MODES:
+        raise ValueError(f"result_mode debe ser uno de {RESULT_MODES}")
+    if result_mode == "dict":
+        return EXEC_PROFILE_DEFAULT
+    factory = record_factory if result_mode == "record" else columnar_factory
+    return session.execution_profile_clone_update(EXEC_PROFILE_DEFAULT, row_factory=factory)
+
+
+def count_rows(item, result_mode):
+    return len(item) if result_mode == "columnar" else 1
+
+
+def finish_rows(items, result_mode, to_dict):
+    """
+    Arma el resultado final del modo a partir de lo que devolvió el
+    row_factory (filas, records o ColumnChunk).
+    """
+    if result_mode == "columnar":
+        return TransactionColumns.from_chunks(items)
+    if result_mode == "record":
+        return items
+    return [to_dict(row) for row in items]
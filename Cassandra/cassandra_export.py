@@ -0,0 +1,229 @@
+"""
+Cassandra/cassandra_export.py
+Exportación completa de transaction_history_v2 por rangos de tokens.
+
+El anillo (Murmur3) se divide en rangos que se recorren en paralelo con
+un pool de procesos; cada worker ejecuta
+
+    WHERE token(account_number, month_bucket) > ? AND token(...) <= ?
+
+y escribe los resultados en archivos .npz comprimidos (un arreglo por
+columna) en el directorio de salida. Cada rango terminado se registra en
+_checkpoint.jsonl, así una exportación interrumpida se reanuda sin repetir
+los rangos completos. Se limita cuántos rangos hay en vuelo por nodo.
+
+Uso:
+
+    python -m Cassandra.cassandra_export export/ --splits 512 --workers 8 --per-node 2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from cassandra.metadata import Murmur3Token
+
+from Cassandra.cassandra_columnar import TransactionColumns, execution_profile_for, _numpy
+from Cassandra.cassandra_statements import bind
+
+
+MIN_TOKEN = -2 ** 63
+MAX_TOKEN = 2 ** 63 - 1
+
+CHECKPOINT_FILE = "_checkpoint.jsonl"
+
+SELECT_TOKEN_RANGE = """
+    SELECT account_number, timestamp, transaction_id, amount, currency, merchant, status
+    FROM transaction_history_v2
+    WHERE token(account_number, month_bucket) > ? AND token(account_number, month_bucket) <= ?
+"""
+
+
+def split_token_ranges(splits):
+    """
+    Divide el anillo completo en `splits` rangos (inicio, fin] contiguos.
+    """
+    step = (MAX_TOKEN - MIN_TOKEN) // splits
+    bounds = [MIN_TOKEN + i * step for i in range(splits)] + [MAX_TOKEN]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def range_owner(cluster, keyspace, token_range):
+    """
+    Primer réplica del rango (se usa para limitar rangos en vuelo por nodo).
+    """
+    replicas = cluster.metadata.token_map.get_replicas(keyspace, Murmur3Token(token_range[1]))
+    return str(replicas[0].endpoint) if replicas else "unknown"
+
+
+def load_checkpoint(out_dir):
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    done = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                done.add((entry["start"], entry["end"]))
+    return done
+
+
+def _part_path(out_dir, token_range, part):
+    return os.path.join(out_dir, f"tokens_{token_range[0]}_{token_range[1]}_part{part:04d}.npz")
+
+
+def write_part(path, chunks):
+    """
+    Escribe un archivo .npz comprimido con las columnas de los chunks.
+    Los categóricos se guardan como códigos + categorías.
+    """
+    np = _numpy()
+    columns = TransactionColumns.from_chunks(chunks)
+    accounts = np.concatenate([chunk.columns["account_number"] for chunk in chunks])
+
+    arrays = {
+        "account_number": accounts.astype(str),
+        "timestamp": columns.timestamp,
+        "transaction_id": columns.transaction_id.astype(str),
+        "amount": columns.amount,
+    }
+    for name, labels in columns.categories.items():
+        arrays[name] = getattr(columns, name)
+        arrays[f"{name}_categories"] = np.array(labels, dtype=str)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+# ============================================================
+# ========================== WORKERS =========================
+# ============================================================
+
+_worker_session = None
+
+
+def _init_worker():
+    global _worker_session
+    from connect import get_cassandra_session
+    _cluster, _worker_session = get_cassandra_session()
+
+
+def export_range(token_range, out_dir, fetch_size, part_rows):
+    """
+    Recorre un rango de tokens por páginas y lo escribe en partes de
+    hasta part_rows filas. Devuelve el resumen para el checkpoint.
+    """
+    session = _worker_session
+    statement = bind(session, SELECT_TOKEN_RANGE, token_range)
+    statement.fetch_size = fetch_size
+    profile = execution_profile_for(session, "columnar")
+
+    parts = []
+    chunks = []
+    buffered = 0
+    total = 0
+    for chunk in session.execute(statement, execution_profile=profile):
+        chunks.append(chunk)
+        buffered += len(chunk)
+        if buffered >= part_rows:
+            path = _part_path(out_dir, token_range, len(parts))
+            write_part(path, chunks)
+            parts.append(os.path.basename(path))
+            total += buffered
+            chunks, buffered = [], 0
+
+    if chunks:
+        path = _part_path(out_dir, token_range, len(parts))
+        write_part(path, chunks)
+        parts.append(os.path.basename(path))
+        total += buffered
+
+    return {"start": token_range[0], "end": token_range[1], "rows": total, "parts": parts}
+
+
+# ============================================================
+# ========================= SCHEDULER ========================
+# ============================================================
+
+def export_transactions(out_dir, splits=256, workers=4, per_node=2, fetch_size=5000, part_rows=500000):
+    """
+    Exporta transaction_history_v2 completa a out_dir. Los rangos ya
+    registrados en el checkpoint se omiten.
+    """
+    from connect import CASSANDRA_KEYSPACE, get_cassandra_session
+
+    os.makedirs(out_dir, exist_ok=True)
+    cluster, _session = get_cassandra_session()
+    done = load_checkpoint(out_dir)
+
+    # Rangos pendientes agrupados por nodo dueño
+    queues = defaultdict(deque)
+    for token_range in split_token_ranges(splits):
+        if token_range not in done:
+            queues[range_owner(cluster, CASSANDRA_KEYSPACE, token_range)].append(token_range)
+
+    pending_count = sum(len(q) for q in queues.values())
+    print(f"Rangos pendientes: {pending_count} (ya exportados: {len(done)})")
+
+    in_flight = defaultdict(int)
+    running = {}
+    exported_rows = 0
+    checkpoint = open(os.path.join(out_dir, CHECKPOINT_FILE), "a")
+
+    # spawn: los workers no heredan las conexiones del driver del proceso padre
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker) as pool:
+            while queues or running:
+                # Llenar la ventana respetando el límite por nodo
+                for host in list(queues):
+                    while queues[host] and len(running) < workers and in_flight[host] < per_node:
+                        token_range = queues[host].popleft()
+                        future = pool.submit(export_range, token_range, out_dir, fetch_size, part_rows)
+                        running[future] = host
+                        in_flight[host] += 1
+                    if not queues[host]:
+                        del queues[host]
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    host = running.pop(future)
+                    in_flight[host] -= 1
+                    entry = future.result()
+                    checkpoint.write(json.dumps(entry) + "\n")
+                    checkpoint.flush()
+                    exported_rows += entry["rows"]
+                    pending_count -= 1
+                print(f"Filas exportadas: {exported_rows}  Rangos pendientes: {pending_count}")
+    finally:
+        checkpoint.close()
+
+    return exported_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exporta transaction_history_v2 por rangos de tokens a archivos .npz."
+    )
+    parser.add_argument("out_dir", help="Directorio de salida (también guarda el checkpoint)")
+    parser.add_argument("--splits", type=int, default=256, help="Número de rangos de tokens")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--per-node", type=int, default=2,
+                        help="Máximo de rangos en vuelo por nodo")
+    parser.add_argument("--fetch-size", type=int, default=5000)
+    parser.add_argument("--part-rows", type=int, default=500000,
+                        help="Filas máximas por archivo .npz")
+    args = parser.parse_args()
+
+    rows = export_transactions(args.out_dir, args.splits, args.workers, args.per_node,
+                               args.fetch_size, args.part_rows)
+    print(f"Exportación terminada: {rows} filas")
+
+
+if __name__ == "__main__":
+    main()
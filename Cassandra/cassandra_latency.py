@@ -0,0 +1,289 @@
+"""
+Cassandra/cassandra_latency.py
+Modo de lectura con SLO de latencia (ruta de autorización).
+
+- Perfil de ejecución con ejecución especulativa (retraso constante o
+  basado en un percentil de las latencias observadas) y timeout por
+  petición. Las lecturas preparadas ya están marcadas como idempotentes,
+  condición del driver para especular.
+- Timeout y nivel de consistencia por llamada.
+- Si la consistencia pedida no responde a tiempo se reintenta con la de
+  respaldo (resultado marcado stale); si se acaba el plazo se devuelve lo
+  obtenido hasta entonces, marcado como partial.
+
+    res = get_recent_transactions_slo(session, "ACC12345", deadline=0.05)
+    if res.partial or res.stale: ...
+"""
+
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime
+
+from cassandra import ConsistencyLevel, OperationTimedOut, ReadTimeout, Unavailable
+from cassandra.cluster import EXEC_PROFILE_DEFAULT, NoHostAvailable
+from cassandra.policies import ConstantSpeculativeExecutionPolicy, SpeculativeExecutionPolicy
+
+from Cassandra.cassandra_queries import (
+    RECENT_MAX_BUCKETS,
+    SELECT_DAILY_TOTAL,
+    SELECT_DAILY_TOTALS_COUNTERS,
+    SELECT_RECENT_TRANSACTIONS,
+    SELECT_TRANSACTIONS_IN_RANGE,
+    _daily_totals_dict,
+    _transaction_dict,
+    month_bucket,
+    month_buckets,
+    previous_bucket
+)
+from Cassandra.cassandra_statements import bind
+
+
+# Errores que indican una réplica lenta o no disponible (se puede degradar)
+SLOW_REPLICA_ERRORS = (OperationTimedOut, ReadTimeout, Unavailable, NoHostAvailable)
+
+DEFAULT_DEADLINE = 0.05
+
+
+class PercentileSpeculativeExecutionPolicy(SpeculativeExecutionPolicy):
+    """
+    Lanza una ejecución especulativa cuando la petición supera el percentil
+    `percentile` de las últimas latencias observadas (en segundos).
+    Mientras no haya suficientes muestras usa `initial_delay`.
+    """
+
+    def __init__(self, percentile=99, max_attempts=2, initial_delay=0.01,
+                 window=1000, min_samples=50):
+        self.percentile = percentile
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def current_delay(self):
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return self.initial_delay
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return ordered[index]
+
+    def new_plan(self, keyspace, statement):
+        return _SpeculativePlan(self.current_delay(), self.max_attempts)
+
+
+class _SpeculativePlan(object):
+
+    def __init__(self, delay, attempts):
+        self.delay = delay
+        self.remaining = attempts
+
+    def next_execution(self, host):
+        if self.remaining <= 0:
+            return -1
+        self.remaining -= 1
+        return self.delay
+
+
+class SLOResult(object):
+    """
+    Resultado de una lectura con plazo:
+    - rows: filas obtenidas (lista o dict, según la consulta)
+    - partial: se acabó el plazo antes de leer todo
+    - stale: al menos una parte se leyó con la consistencia de respaldo
+    - error: último error de réplica lenta, si hubo
+    """
+    __slots__ = ("rows", "partial", "stale", "error", "elapsed")
+
+    def __init__(self, rows, partial=False, stale=False, error=None, elapsed=0.0):
+        self.rows = rows
+        self.partial = partial
+        self.stale = stale
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f"SLOResult(rows={len(self.rows) if self.rows is not None else None}, "
+                f"partial={self.partial}, stale={self.stale}, elapsed={self.elapsed:.4f})")
+
+
+# sesión -> {configuración: perfil}
+_profiles = weakref.WeakKeyDictionary()
+_profiles_lock = threading.Lock()
+
+
+def latency_profile(session, speculative="constant", delay=0.01, max_attempts=2,
+                    percentile=99, request_timeout=DEFAULT_DEADLINE):
+    """
+    Perfil de ejecución del modo SLO. Se crea una vez por sesión y por
+    configuración (speculative, delay, max_attempts, percentile,
+    request_timeout): llamadas con otros parámetros obtienen su propio
+    perfil.
+    speculative: "constant" (cada `delay` s) o "percentile".
+    """
+    if speculative not in ("constant", "percentile"):
+        raise ValueError("speculative debe ser 'constant' o 'percentile'")
+    key = (speculative, delay, max_attempts, percentile if speculative == "percentile" else None,
+           request_timeout)
+
+    with _profiles_lock:
+        by_config = _profiles.setdefault(session, {})
+        profile = by_config.get(key)
+        if profile is None:
+            if speculative == "percentile":
+                policy = PercentileSpeculativeExecutionPolicy(percentile, max_attempts, initial_delay=delay)
+            else:
+                policy = ConstantSpeculativeExecutionPolicy(delay, max_attempts)
+            profile = session.execution_profile_clone_update(
+                EXEC_PROFILE_DEFAULT,
+                speculative_execution_policy=policy,
+                request_timeout=request_timeout
+            )
+            by_config[key] = profile
+    return profile
+
+
+class _Deadline(object):
+
+    def __init__(self, seconds):
+        self.started = time.monotonic()
+        self.expires = self.started + seconds
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+def _record_latency(profile, latency):
+    policy = profile.speculative_execution_policy
+    if isinstance(policy, PercentileSpeculativeExecutionPolicy):
+        policy.record(latency)
+
+
+def _submit(session, query, params, consistency_level, timeout, profile):
+    statement = bind(session, query, params)
+    statement.consistency_level = consistency_level
+    return session.execute_async(statement, timeout=timeout, execution_profile=profile)
+
+
+def _read(session, query, params, deadline, result, consistency_level,
+          fallback_consistency, profile):
+    """
+    Lee con la consistencia pedida y, si la réplica es lenta y queda
+    plazo, con la de respaldo. Devuelve las filas o None si se acabó el plazo.
+    """
+    levels = [consistency_level]
+    if fallback_consistency is not None and fallback_consistency != consistency_level:
+        levels.append(fallback_consistency)
+
+    for level in levels:
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            break
+        started = time.monotonic()
+        try:
+            rows = list(_submit(session, query, params, level, remaining, profile).result())
+        except SLOW_REPLICA_ERRORS as e:
+            result.error = str(e)
+            continue
+        _record_latency(profile, time.monotonic() - started)
+        if level != consistency_level:
+            result.stale = True
+        return rows
+
+    result.partial = True
+    return None
+
+
+def get_recent_transactions_slo(session, account_number, limit=20, deadline=DEFAULT_DEADLINE,
+                                consistency_level=ConsistencyLevel.LOCAL_QUORUM,
+                                fallback_consistency=ConsistencyLevel.ONE,
+                                max_buckets=RECENT_MAX_BUCKETS, profile=None):
+    """
+    get_recent_transactions con plazo total `deadline` (segundos).
+    """
+    profile = profile or latency_profile(session)
+    clock = _Deadline(deadline)
+    result = SLOResult([])
+
+    bucket = month_bucket(datetime.utcnow())
+    for _ in range(max_buckets):
+        rows = _read(session, SELECT_RECENT_TRANSACTIONS,
+                     (account_number, bucket, limit - len(result.rows)),
+                     clock, result, consistency_level, fallback_consistency, profile)
+        if rows is None:
+            break
+        result.rows.extend(_transaction_dict(row) for row in rows)
+        if len(result.rows) >= limit:
+            break
+        bucket = previous_bucket(bucket)
+
+    result.elapsed = clock.elapsed()
+    return result
+
+
+def get_transactions_in_range_slo(session, account_number, start_ts, end_ts, deadline=DEFAULT_DEADLINE,
+                                  consistency_level=ConsistencyLevel.LOCAL_QUORUM,
+                                  fallback_consistency=ConsistencyLevel.ONE, profile=None):
+    """
+    get_transactions_in_range con plazo total. Los buckets se piden en
+    paralelo; los que fallan por réplica lenta se reintentan con la
+    consistencia de respaldo si queda plazo.
+    """
+    profile = profile or latency_profile(session)
+    clock = _Deadline(deadline)
+    result = SLOResult([])
+
+    buckets = month_buckets(start_ts, end_ts)
+    futures = [
+        _submit(session, SELECT_TRANSACTIONS_IN_RANGE, (account_number, bucket, start_ts, end_ts),
+                consistency_level, deadline, profile)
+        for bucket in buckets
+    ]
+    for bucket, future in zip(buckets, futures):
+        try:
+            rows = list(future.result())
+        except SLOW_REPLICA_ERRORS as e:
+            result.error = str(e)
+            rows = _read(session, SELECT_TRANSACTIONS_IN_RANGE, (account_number, bucket, start_ts, end_ts),
+                         clock, result, fallback_consistency, None, profile)
+            if rows is not None:
+                result.stale = True
+            else:
+                continue
+        result.rows.extend(_transaction_dict(row) for row in rows)
+
+    result.elapsed = clock.elapsed()
+    return result
+
+
+def get_daily_totals_slo(session, account_number, day_date, deadline=DEFAULT_DEADLINE,
+                         consistency_level=ConsistencyLevel.LOCAL_QUORUM,
+                         fallback_consistency=ConsistencyLevel.ONE, profile=None):
+    """
+    get_daily_totals con plazo total; rows es el dict del día o None.
+    """
+    profile = profile or latency_profile(session)
+    clock = _Deadline(deadline)
+    result = SLOResult(None)
+
+    rows = _read(session, SELECT_DAILY_TOTAL, (account_number, day_date),
+                 clock, result, consistency_level, fallback_consistency, profile)
+    if rows:
+        result.rows = _daily_totals_dict(account_number, day_date, rows[0])
+    elif rows is not None:
+        rows = _read(session, SELECT_DAILY_TOTALS_COUNTERS, (account_number, day_date),
+                     clock, result, consistency_level, fallback_consistency, profile)
+        if rows:
+            result.rows = _daily_totals_dict(account_number, day_date, rows[0], from_counters=True)
+
+    result.elapsed = clock.elapsed()
+    return result
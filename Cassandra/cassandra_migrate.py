@@ -0,0 +1,271 @@
+"""
+Cassandra/cassandra_migrate.py
+Copia las transacciones de transaction_history (v1) a transaction_history_v2.
+
+Las lecturas solo consultan transaction_history_v2, así que las filas que
+quedaron en la tabla v1 deben copiarse una vez. Cada rango de tokens de
+la tabla v1 se recorre por páginas y cada fila se escribe en
+transaction_history_v2, transactions_by_id y (si lo trae) en
+transaction_payloads.
+
+Las filas v1 nunca pasaron por los contadores, así que sus totales se
+calculan durante la copia. Una partición v1 es una cuenta completa y cae
+en un solo rango, por eso los totales de un rango son definitivos:
+
+- daily_totals_v1 (cuenta, día) y daily_active_accounts.
+- merchant_daily_totals_v1 (comercio, día, estado, cuenta).
+- daily_totals de los días cerrados: totales de v1 más el contador de
+  v2 del día, si existe (la misma suma que hace cassandra_rollup).
+
+La copia es idempotente: el event_id de v2 se deriva del timestamp y del
+transaction_id de la fila v1, y los totales se escriben con INSERT de
+valores calculados, no con incrementos de contadores. Volver a copiar
+un rango sobrescribe las mismas filas con los mismos valores. Cada rango
+terminado se registra en el archivo de checkpoint para reanudar sin
+repetirlo.
+
+Uso:
+
+    python -m Cassandra.cassandra_migrate --splits 256 --checkpoint migrate_v1.jsonl
+"""
+
+import argparse
+import json
+import os
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+from cassandra.concurrent import execute_concurrent, execute_concurrent_with_args
+from cassandra.util import uuid_from_time
+
+from Cassandra.cassandra_export import split_token_ranges
+from Cassandra.cassandra_payloads import encode_payload
+from Cassandra.cassandra_queries import (
+    INSERT_DAILY_ACTIVE_ACCOUNT,
+    INSERT_DAILY_TOTALS_V1,
+    INSERT_MERCHANT_DAILY_TOTALS_V1,
+    INSERT_TRANSACTION,
+    INSERT_TRANSACTION_BY_ID,
+    INSERT_TRANSACTION_PAYLOAD,
+    daily_active_shard,
+    month_bucket,
+    new_transaction_row,
+    notify_daily_totals_write,
+    to_minor_units
+)
+from Cassandra.cassandra_rollup import INSERT_DAILY_TOTAL, SELECT_COUNTERS, frozen_daily_total
+from Cassandra.cassandra_statements import bind, prepare
+
+
+SELECT_V1_TOKEN_RANGE = """
+    SELECT account_number, timestamp, transaction_id, amount, currency, merchant, status, raw_payload
+    FROM transaction_history
+    WHERE token(account_number) > ? AND token(account_number) <= ?
+"""
+
+# Espacio de nombres para el transaction_id de filas v1 que no lo tienen
+V1_NAMESPACE = uuid.UUID("6f1c2a4e-8d3b-4b7a-9c55-2f0e7d1a9b30")
+
+# Totales de v1 de un (cuenta, día), con los campos de daily_totals_v1
+V1Totals = namedtuple("V1Totals", ["amount_minor", "transaction_count"])
+
+
+def v2_row_from_v1(row):
+    """
+    TransactionRow de v2 para una fila de transaction_history. El
+    event_id usa el transaction_id como nodo y clock_seq del timeuuid, así
+    siempre es el mismo para la misma fila v1.
+    """
+    transaction_id = row.transaction_id or uuid.uuid5(
+        V1_NAMESPACE, f"{row.account_number}|{row.timestamp.isoformat()}"
+    )
+    tx = new_transaction_row(
+        row.account_number, row.amount, row.currency, row.merchant, row.status,
+        timestamp=row.timestamp, transaction_id=transaction_id
+    )
+    event_id = uuid_from_time(
+        row.timestamp,
+        node=transaction_id.int & 0xFFFFFFFFFFFF,
+        clock_seq=(transaction_id.int >> 48) & 0x3FFF
+    )
+    return tx._replace(event_id=event_id)
+
+
+def v2_writes(session, row):
+    """
+    (sentencia, parámetros) que copian una fila v1 a las tablas de v2.
+    """
+    tx = v2_row_from_v1(row)
+    writes = [
+        (prepare(session, INSERT_TRANSACTION), tx),
+        (prepare(session, INSERT_TRANSACTION_BY_ID), (
+            tx.transaction_id, tx.account_number, tx.month_bucket, tx.event_id, tx.timestamp,
+            tx.amount, tx.currency, tx.merchant, tx.status
+        )),
+    ]
+    if row.raw_payload:
+        writes.append((prepare(session, INSERT_TRANSACTION_PAYLOAD), (
+            tx.transaction_id, encode_payload(row.raw_payload)
+        )))
+    return writes
+
+
+def totals_writes(session, by_day, by_merchant):
+    """
+    (sentencia, parámetros) con los totales de v1 de un rango: by_day por
+    (cuenta, día) y by_merchant por (comercio, día, estado, cuenta), con
+    valores V1Totals.
+    """
+    writes = []
+    for (account_number, day_date), totals in by_day.items():
+        writes.append((prepare(session, INSERT_DAILY_TOTALS_V1), (account_number, day_date) + tuple(totals)))
+        writes.append((prepare(session, INSERT_DAILY_ACTIVE_ACCOUNT), (
+            day_date, daily_active_shard(account_number), account_number
+        )))
+    for (merchant, day_date, status, account_number), totals in by_merchant.items():
+        writes.append((prepare(session, INSERT_MERCHANT_DAILY_TOTALS_V1), (
+            merchant, month_bucket(day_date), day_date, status or "", account_number
+        ) + tuple(totals)))
+    return writes
+
+
+def freeze_days(session, by_day, concurrency=100):
+    """
+    Escribe en daily_totals los días cerrados de by_day: totales de v1 más
+    el contador del día. Devuelve la lista de errores.
+    """
+    today = datetime.utcnow().date()
+    keys = [key for key in by_day if key[1] < today]
+    counters = execute_concurrent_with_args(
+        session, prepare(session, SELECT_COUNTERS), keys,
+        concurrency=concurrency, raise_on_first_error=False
+    )
+
+    errors = []
+    writes = []
+    for (account_number, day_date), (success, result) in zip(keys, counters):
+        if not success:
+            errors.append(f"{account_number} {day_date}: {result}")
+            continue
+        total = frozen_daily_total(account_number, day_date, result.one(), by_day[(account_number, day_date)])
+        writes.append((prepare(session, INSERT_DAILY_TOTAL), total))
+    errors.extend(_write_all(session, writes, concurrency))
+
+    for account_number, day_date, _amount, _count in (params for _statement, params in writes):
+        notify_daily_totals_write(account_number, day_date)
+    return errors
+
+
+def _write_all(session, writes, concurrency):
+    results = execute_concurrent(session, writes, concurrency=concurrency, raise_on_first_error=False)
+    return [str(result) for success, result in results if not success]
+
+
+def _add(totals, key, amount_minor):
+    amount, count = totals.get(key, (0, 0))
+    totals[key] = V1Totals(amount + amount_minor, count + 1)
+
+
+def migrate_range(session, token_range, fetch_size=1000, concurrency=100):
+    """
+    Copia las filas v1 de un rango de tokens y escribe sus totales.
+    Devuelve {"start", "end", "rows", "errors"}; un rango con errores no
+    se marca como terminado.
+    """
+    statement = bind(session, SELECT_V1_TOKEN_RANGE, token_range)
+    statement.fetch_size = fetch_size
+
+    copied = 0
+    errors = []
+    writes = []
+    by_day = {}
+    by_merchant = {}
+    for row in session.execute(statement):
+        try:
+            row_writes = v2_writes(session, row)
+            amount_minor = to_minor_units(row.amount)
+        except Exception as e:
+            errors.append(f"{row.account_number} {row.timestamp}: {e}")
+            continue
+        writes.extend(row_writes)
+        day_date = row.timestamp.date()
+        _add(by_day, (row.account_number, day_date), amount_minor)
+        if row.merchant:
+            _add(by_merchant, (row.merchant, day_date, row.status, row.account_number), amount_minor)
+        copied += 1
+        if len(writes) >= fetch_size:
+            errors.extend(_write_all(session, writes, concurrency))
+            writes = []
+    if writes:
+        errors.extend(_write_all(session, writes, concurrency))
+
+    errors.extend(_write_all(session, totals_writes(session, by_day, by_merchant), concurrency))
+    errors.extend(freeze_days(session, by_day, concurrency))
+
+    return {"start": token_range[0], "end": token_range[1], "rows": copied, "errors": errors}
+
+
+def load_checkpoint(path):
+    done = set()
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                done.add((entry["start"], entry["end"]))
+    return done
+
+
+def migrate_v1_to_v2(session, splits=256, checkpoint_path=None, fetch_size=1000, concurrency=100):
+    """
+    Copia transaction_history completa a transaction_history_v2, rango por
+    rango. Los rangos ya registrados en el checkpoint se omiten. Devuelve
+    {"rows": n, "failed_ranges": [...]}.
+    """
+    done = load_checkpoint(checkpoint_path)
+    checkpoint = open(checkpoint_path, "a") if checkpoint_path else None
+
+    rows = 0
+    failed_ranges = []
+    try:
+        for token_range in split_token_ranges(splits):
+            if token_range in done:
+                continue
+            entry = migrate_range(session, token_range, fetch_size, concurrency)
+            rows += entry["rows"]
+            if entry["errors"]:
+                print(f"Rango {token_range}: {len(entry['errors'])} errores (se reintentará)")
+                failed_ranges.append(entry)
+            elif checkpoint:
+                checkpoint.write(json.dumps({"start": entry["start"], "end": entry["end"],
+                                             "rows": entry["rows"]}) + "\n")
+                checkpoint.flush()
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    return {"rows": rows, "failed_ranges": failed_ranges}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Copia transaction_history (v1) a transaction_history_v2."
+    )
+    parser.add_argument("--splits", type=int, default=256, help="Número de rangos de tokens")
+    parser.add_argument("--checkpoint", default="migrate_v1.jsonl",
+                        help="Archivo JSONL con los rangos ya copiados")
+    parser.add_argument("--fetch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100,
+                        help="Escrituras en vuelo")
+    args = parser.parse_args()
+
+    from connect import get_cassandra_session
+    _cluster, session = get_cassandra_session()
+
+    result = migrate_v1_to_v2(session, args.splits, args.checkpoint, args.fetch_size, args.concurrency)
+    print(f"Copia terminada: {result['rows']} filas, "
+          f"{len(result['failed_ranges'])} rangos con errores")
+
+
+if __name__ == "__main__":
+    main()
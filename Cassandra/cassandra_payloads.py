@@ -0,0 +1,93 @@
+"""
+Cassandra/cassandra_payloads.py
+Codificación del raw_payload de las transacciones.
+
+El payload se guarda como blob en transaction_payloads, con un encabezado
+de 4 bytes seguido de los datos:
+
+    b"TP" | versión (1 byte) | códec (1 byte) | datos
+
+Códecs: 0 = sin comprimir, 1 = zlib, 2 = lz4 (si el paquete lz4 está
+instalado). Los payloads pequeños se guardan sin comprimir.
+"""
+
+import json
+import zlib
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+MAGIC = b"TP"
+VERSION = 1
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZ4 = 2
+
+# Por debajo de este tamaño comprimir no compensa el costo
+MIN_COMPRESS_SIZE = 256
+
+ZLIB_LEVEL = 6
+
+
+def default_codec():
+    return CODEC_LZ4 if lz4_frame is not None else CODEC_ZLIB
+
+
+def payload_bytes(payload):
+    """
+    Bytes del payload: str en UTF-8, bytes tal cual y cualquier otro valor
+    (dict, list, números...) serializado como JSON. Un valor que no se
+    puede serializar lanza TypeError.
+    """
+    if isinstance(payload, str):
+        return payload.encode("utf-8")
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return bytes(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def encode_payload(payload, codec=None):
+    """
+    Convierte el payload en el blob con encabezado (ver payload_bytes; un
+    dict se guarda como su JSON y decode_payload devuelve ese texto).
+    """
+    data = payload_bytes(payload)
+
+    if codec is None:
+        codec = default_codec() if len(data) >= MIN_COMPRESS_SIZE else CODEC_NONE
+
+    if codec == CODEC_ZLIB:
+        data = zlib.compress(data, ZLIB_LEVEL)
+    elif codec == CODEC_LZ4:
+        if lz4_frame is None:
+            raise ImportError("El códec lz4 requiere el paquete lz4 (pip install lz4)")
+        data = lz4_frame.compress(data)
+    elif codec != CODEC_NONE:
+        raise ValueError(f"Códec de payload desconocido: {codec}")
+
+    return MAGIC + bytes((VERSION, codec)) + data
+
+
+def decode_payload(blob, as_text=True):
+    """
+    Devuelve el payload original (str, o bytes si as_text=False).
+    """
+    blob = bytes(blob)
+    if blob[:2] != MAGIC or blob[2] != VERSION:
+        raise ValueError("Encabezado de payload inválido")
+
+    codec, data = blob[3], blob[4:]
+    if codec == CODEC_ZLIB:
+        data = zlib.decompress(data)
+    elif codec == CODEC_LZ4:
+        if lz4_frame is None:
+            raise ImportError("El códec lz4 requiere el paquete lz4 (pip install lz4)")
+        data = lz4_frame.decompress(data)
+    elif codec != CODEC_NONE:
+        raise ValueError(f"Códec de payload desconocido: {codec}")
+
+    return data.decode("utf-8") if as_text else data
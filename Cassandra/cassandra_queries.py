@@ -1,123 +1,552 @@
+import base64
+import struct
 import uuid
-from datetime import datetime, date
+import zlib
+from collections import namedtuple
+from datetime import datetime, date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import BatchStatement, BatchType
+from cassandra.util import uuid_from_time
+
+from Cassandra.cassandra_columnar import count_rows, execution_profile_for, finish_rows
+from Cassandra.cassandra_payloads import decode_payload, encode_payload
+from Cassandra.cassandra_statements import bind, execute, prepare
+
+
+# Los contadores guardan montos en unidades menores (centavos)
+MINOR_UNITS = 100
+
+# Particiones (por día) del índice de cuentas con actividad
+DAILY_ACTIVE_SHARDS = 16
+
+# Meses hacia atrás que revisa get_recent_transactions
+RECENT_MAX_BUCKETS = 24
+
+
+# Callbacks avisados al escribir los contadores de un día (ver
+# add_daily_totals_listener)
+_daily_totals_listeners = []
+
+# Fila de transaction_history_v2, en el orden de INSERT_TRANSACTION
+TransactionRow = namedtuple("TransactionRow", [
+    "account_number", "month_bucket", "event_id", "timestamp", "transaction_id",
+    "amount", "currency", "merchant", "status"
+])
+
+INSERT_TRANSACTION = """
+    INSERT INTO transaction_history_v2 (
+        account_number, month_bucket, event_id, timestamp, transaction_id,
+        amount, currency, merchant, status
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_TRANSACTION_BY_ID = """
+    INSERT INTO transactions_by_id (
+        transaction_id, account_number, month_bucket, event_id, timestamp,
+        amount, currency, merchant, status
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SELECT_TRANSACTION_BY_ID = """
+    SELECT transaction_id, account_number, month_bucket, event_id, timestamp,
+           amount, currency, merchant, status
+    FROM transactions_by_id
+    WHERE transaction_id = ?
+"""
+
+INSERT_TRANSACTION_PAYLOAD = """
+    INSERT INTO transaction_payloads (transaction_id, payload)
+    VALUES (?, ?)
+"""
+
+SELECT_TRANSACTION_PAYLOAD = """
+    SELECT payload FROM transaction_payloads WHERE transaction_id = ?
+"""
+
+SELECT_TRANSACTIONS_BY_BUCKET = """
+    SELECT timestamp, transaction_id, amount, currency, merchant, status
+    FROM transaction_history_v2
+    WHERE account_number = ? AND month_bucket = ?
+"""
+
+SELECT_RECENT_TRANSACTIONS = SELECT_TRANSACTIONS_BY_BUCKET + " LIMIT ?"
+
+SELECT_TRANSACTIONS_IN_RANGE = SELECT_TRANSACTIONS_BY_BUCKET + """
+    AND event_id >= minTimeuuid(?) AND event_id <= maxTimeuuid(?)
+"""
+
+SELECT_DAILY_TOTAL = """
+    SELECT total_amount, transaction_count
+    FROM daily_totals
+    WHERE account_number = ? AND date = ?
+"""
+
+SELECT_DAILY_TOTALS_COUNTERS = """
+    SELECT amount_minor, transaction_count
+    FROM daily_totals_counters
+    WHERE account_number = ? AND date = ?
+"""
+
+UPDATE_DAILY_TOTALS_COUNTERS = """
+    UPDATE daily_totals_counters
+    SET amount_minor = amount_minor + ?, transaction_count = transaction_count + ?
+    WHERE account_number = ? AND date = ?
+"""
+
+INSERT_DAILY_ACTIVE_ACCOUNT = """
+    INSERT INTO daily_active_accounts (date, shard, account_number)
+    VALUES (?, ?, ?)
+"""
+
+UPDATE_MERCHANT_DAILY_TOTALS = """
+    UPDATE merchant_daily_totals
+    SET amount_minor = amount_minor + ?, transaction_count = transaction_count + ?
+    WHERE merchant = ? AND month_bucket = ? AND day = ? AND status = ?
+"""
+
+SELECT_MERCHANT_DAILY_TOTALS = """
+    SELECT day, status, amount_minor, transaction_count
+    FROM merchant_daily_totals
+    WHERE merchant = ? AND month_bucket = ? AND day >= ? AND day <= ?
+"""
+
+SELECT_DAILY_TOTALS_V1 = """
+    SELECT amount_minor, transaction_count
+    FROM daily_totals_v1
+    WHERE account_number = ? AND date = ?
+"""
+
+INSERT_DAILY_TOTALS_V1 = """
+    INSERT INTO daily_totals_v1 (account_number, date, amount_minor, transaction_count)
+    VALUES (?, ?, ?, ?)
+"""
+
+INSERT_MERCHANT_DAILY_TOTALS_V1 = """
+    INSERT INTO merchant_daily_totals_v1 (
+        merchant, month_bucket, day, status, account_number, amount_minor, transaction_count
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+SELECT_MERCHANT_DAILY_TOTALS_V1 = """
+    SELECT day, status, amount_minor, transaction_count
+    FROM merchant_daily_totals_v1
+    WHERE merchant = ? AND month_bucket = ? AND day >= ? AND day <= ?
+"""
+
+INSERT_ALERT = """
+    INSERT INTO alerts (
+        alert_id, timestamp, account_number, transaction_id, reason
+    ) VALUES (?, ?, ?, ?, ?)
+"""
+
+INSERT_ALERT_BY_ACCOUNT = """
+    INSERT INTO alerts_by_account (
+        account_number, timestamp, alert_id, transaction_id, reason
+    ) VALUES (?, ?, ?, ?, ?)
+"""
+
+INSERT_ALERT_BY_TIME = """
+    INSERT INTO alerts_by_time (
+        day_bucket, timestamp, alert_id, account_number, transaction_id, reason
+    ) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+SELECT_ALERTS_BY_ACCOUNT = """
+    SELECT alert_id, timestamp, transaction_id, reason
+    FROM alerts_by_account
+    WHERE account_number = ?
+"""
+
+SELECT_LATEST_ALERTS = """
+    SELECT alert_id, timestamp, account_number, transaction_id, reason
+    FROM alerts_by_time
+    WHERE day_bucket = ?
+    LIMIT ?
+"""
+
+
+def month_bucket(ts):
+    """
+    Bucket mensual de la partición (p. ej. 202511).
+    """
+    return ts.year * 100 + ts.month
 
 
+def previous_bucket(bucket):
+    year, month = divmod(bucket, 100)
+    return bucket - 1 if month > 1 else (year - 1) * 100 + 12
 
-#  1. Insertar una transacción en transaction_history
-def insert_transaction(session, account_number, amount, currency, merchant, status, raw_payload=""):
+
+def month_buckets(start_ts, end_ts):
+    """
+    Buckets mensuales que cubren [start_ts, end_ts], del más reciente al
+    más antiguo.
+    """
+    buckets = []
+    bucket = month_bucket(end_ts)
+    first = month_bucket(start_ts)
+    while bucket >= first:
+        buckets.append(bucket)
+        bucket = previous_bucket(bucket)
+    return buckets
+
+
+def new_transaction_row(account_number, amount, currency, merchant, status,
+                        timestamp=None, transaction_id=None):
+    """
+    Arma la fila a insertar. event_id es un timeuuid del timestamp, así
+    dos transacciones en el mismo milisegundo no se sobrescriben.
+    """
+    ts = timestamp or datetime.utcnow()
+    return TransactionRow(
+        account_number=account_number,
+        month_bucket=month_bucket(ts),
+        event_id=uuid_from_time(ts),
+        timestamp=ts,
+        transaction_id=transaction_id or uuid.uuid4(),
+        amount=Decimal(str(amount)),
+        currency=currency,
+        merchant=merchant,
+        status=status
+    )
+
+
+def _transaction_dict(row):
+    return {
+        "timestamp": row.timestamp,
+        "transaction_id": row.transaction_id,
+        "amount": row.amount,
+        "currency": row.currency,
+        "merchant": row.merchant,
+        "status": row.status
+    }
+
+
+def _daily_totals_dict(account_number, day_date, row, from_counters=False):
+    if from_counters:
+        return {
+            "account_number": account_number,
+            "date": day_date,
+            "total_amount": from_minor_units(row.amount_minor or 0),
+            "transaction_count": row.transaction_count or 0
+        }
+    return {
+        "account_number": account_number,
+        "date": day_date,
+        "total_amount": row.total_amount,
+        "transaction_count": row.transaction_count
+    }
+
+
+def _alert_dict(row):
+    alert = {
+        "alert_id": row.alert_id,
+        "timestamp": row.timestamp,
+        "transaction_id": row.transaction_id,
+        "reason": row.reason
+    }
+    if hasattr(row, "account_number"):
+        alert["account_number"] = row.account_number
+    return alert
+
+
+def alert_batch(session, alert_id, now, account_number, transaction_id, reason):
+    """
+    Batch LOGGED que escribe la alerta en alerts, alerts_by_account y
+    alerts_by_time.
     """
-    Inserta una transacción completa en Cassandra.
+    batch = BatchStatement(batch_type=BatchType.LOGGED)
+    batch.add(prepare(session, INSERT_ALERT), (
+        alert_id, now, account_number, transaction_id, reason
+    ))
+    batch.add(prepare(session, INSERT_ALERT_BY_ACCOUNT), (
+        account_number, now, alert_id, transaction_id, reason
+    ))
+    batch.add(prepare(session, INSERT_ALERT_BY_TIME), (
+        now.date(), now, alert_id, account_number, transaction_id, reason
+    ))
+    return batch
+
+
+def alerts_by_account_query(account_number, start_ts=None, end_ts=None, limit=None):
     """
-    query = """
-        INSERT INTO transaction_history (
-            account_number, timestamp, transaction_id,
-            amount, currency, merchant, status, raw_payload
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    Arma (consulta, parámetros) de get_alerts_by_account según los filtros.
     """
+    query = SELECT_ALERTS_BY_ACCOUNT
+    params = [account_number]
+    if start_ts is not None:
+        query += " AND timestamp >= ?"
+        params.append(start_ts)
+    if end_ts is not None:
+        query += " AND timestamp <= ?"
+        params.append(end_ts)
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
+
+
+def _transaction_by_id_dict(row):
+    tx = _transaction_dict(row)
+    tx["account_number"] = row.account_number
+    tx["month_bucket"] = row.month_bucket
+    tx["event_id"] = row.event_id
+    return tx
+
+
+def transaction_by_id_statement(session, tx):
+    """
+    Sentencia que registra la transacción en transactions_by_id.
+    """
+    return bind(session, INSERT_TRANSACTION_BY_ID, (
+        tx.transaction_id, tx.account_number, tx.month_bucket, tx.event_id, tx.timestamp,
+        tx.amount, tx.currency, tx.merchant, tx.status
+    ))
 
-    tx_id = uuid.uuid4()
-    now = datetime.utcnow()
 
-    try:
-        session.execute(query, (
-            account_number,
-            now,
-            tx_id,
-            amount,
-            currency,
-            merchant,
-            status,
-            raw_payload
+def add_daily_totals_listener(callback):
+    """
+    Registra callback(account_number, day_date), que se llama cada vez que
+    se actualizan los contadores de un día (p. ej. para invalidar la caché
+    de cassandra_cache).
+    """
+    if callback not in _daily_totals_listeners:
+        _daily_totals_listeners.append(callback)
+
+
+def remove_daily_totals_listener(callback):
+    if callback in _daily_totals_listeners:
+        _daily_totals_listeners.remove(callback)
+
+
+def notify_daily_totals_write(account_number, day_date):
+    for callback in list(_daily_totals_listeners):
+        try:
+            callback(account_number, day_date)
+        except Exception as e:
+            print(f"Error en listener de daily_totals: {e}")
+
+
+def to_minor_units(amount):
+    """
+    Convierte un monto a unidades menores enteras (para los contadores).
+    """
+    minor = Decimal(str(amount)) * MINOR_UNITS
+    return int(minor.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor_units(amount_minor):
+    return Decimal(amount_minor) / MINOR_UNITS
+
+
+def daily_active_shard(account_number):
+    return zlib.crc32(account_number.encode("utf-8")) % DAILY_ACTIVE_SHARDS
+
+
+def daily_totals_counter_statement(session, account_number, day_date, amount_minor, count):
+    """
+    Sentencia que acumula (monto, número) en daily_totals_counters.
+    """
+    return bind(session, UPDATE_DAILY_TOTALS_COUNTERS, (
+        amount_minor, count, account_number, day_date
+    ))
+
+
+def daily_active_statement(session, account_number, day_date):
+    """
+    Sentencia que registra la cuenta como activa en el día (para el rollup).
+    """
+    return bind(session, INSERT_DAILY_ACTIVE_ACCOUNT, (
+        day_date, daily_active_shard(account_number), account_number
+    ))
+
+
+def daily_totals_statements(session, account_number, day_date, amount_minor, count):
+    """
+    Sentencias que acumulan (monto, número) en daily_totals_counters y
+    registran la cuenta como activa en el día (para el rollup).
+    """
+    return [
+        daily_totals_counter_statement(session, account_number, day_date, amount_minor, count),
+        daily_active_statement(session, account_number, day_date),
+    ]
+
+
+def merchant_totals_statement(session, merchant, day_date, status, amount_minor, count):
+    """
+    Sentencia que acumula (monto, número) del comercio en el día y estado.
+    """
+    return bind(session, UPDATE_MERCHANT_DAILY_TOTALS, (
+        amount_minor, count, merchant, month_bucket(day_date), day_date, status or ""
+    ))
+
+
+def payload_statement(session, transaction_id, raw_payload):
+    """
+    Sentencia que guarda el payload comprimido en transaction_payloads.
+    """
+    return encoded_payload_statement(session, transaction_id, encode_payload(raw_payload))
+
+
+def encoded_payload_statement(session, transaction_id, blob):
+    """
+    Igual que payload_statement, con el blob ya codificado (encode_payload).
+    """
+    return bind(session, INSERT_TRANSACTION_PAYLOAD, (transaction_id, blob))
+
+
+def transaction_batch(session, tx, raw_payload=""):
+    """
+    Batch LOGGED con las escrituras de la transacción que no son
+    contadores: historial, índice por transaction_id, cuenta activa del
+    día y, si lo hay, el payload. Se escriben todas o ninguna.
+    """
+    batch = BatchStatement(batch_type=BatchType.LOGGED)
+    batch.add(bind(session, INSERT_TRANSACTION, tx))
+    batch.add(transaction_by_id_statement(session, tx))
+    batch.add(daily_active_statement(session, tx.account_number, tx.timestamp.date()))
+    if raw_payload:
+        batch.add(payload_statement(session, tx.transaction_id, raw_payload))
+    return batch
+
+
+def counter_statements(session, tx):
+    """
+    Contadores del día de la cuenta y del comercio. No pueden ir en un
+    batch LOGGED y no son idempotentes: se aplican una sola vez, después
+    de escribir transaction_batch.
+    """
+    day_date = tx.timestamp.date()
+    amount_minor = to_minor_units(tx.amount)
+    statements = [daily_totals_counter_statement(session, tx.account_number, day_date, amount_minor, 1)]
+    if tx.merchant:
+        statements.append(merchant_totals_statement(
+            session, tx.merchant, day_date, tx.status, amount_minor, 1
         ))
-        return {"transaction_id": tx_id, "timestamp": now}
+    return statements
+
+
+#  1. Insertar una transacción en transaction_history
+def insert_transaction(session, account_number, amount, currency, merchant, status, raw_payload=""):
+    """
+    Inserta una transacción completa en Cassandra y actualiza los
+    contadores del día de la cuenta. El raw_payload se guarda comprimido
+    en transaction_payloads (ver get_transaction_payload).
+
+    Devuelve None solo si la transacción no se escribió. Si se escribió
+    pero falló algún contador, devuelve el transaction_id igual, con
+    counters_applied=False y el error: la transacción no debe
+    reintentarse (duplicaría la fila y los montos).
+    """
+    tx = new_transaction_row(account_number, amount, currency, merchant, status)
+
+    try:
+        session.execute(transaction_batch(session, tx, raw_payload))
     except Exception as e:
         print(f"Error insertando transacción: {e}")
         return None
 
+    result = {"transaction_id": tx.transaction_id, "timestamp": tx.timestamp, "counters_applied": True}
+    try:
+        futures = [session.execute_async(statement) for statement in counter_statements(session, tx)]
+        for future in futures:
+            future.result()
+    except Exception as e:
+        print(f"Transacción {tx.transaction_id} insertada, pero falló la actualización de contadores: {e}")
+        result["counters_applied"] = False
+        result["counters_error"] = str(e)
+    # Aun con error, alguno de los contadores pudo haberse aplicado
+    notify_daily_totals_write(tx.account_number, tx.timestamp.date())
+    return result
+
 
 #  2. Obtener transacciones recientes por cuenta
-def get_recent_transactions(session, account_number, limit=20):
+def get_recent_transactions(session, account_number, limit=20, max_buckets=RECENT_MAX_BUCKETS,
+                            result_mode="dict"):
     """
     Devuelve las N transacciones más recientes.
+    Recorre los buckets mensuales hacia atrás (hasta max_buckets meses)
+    hasta juntar `limit` transacciones.
+    result_mode: "dict", "record" o "columnar" (ver cassandra_columnar).
     """
-    query = """
-        SELECT timestamp, transaction_id, amount, currency, merchant, status 
-        FROM transaction_history 
-        WHERE account_number = %s 
-        LIMIT %s
-    """
+    profile = execution_profile_for(session, result_mode)
+    items = []
     try:
-        rows = session.execute(query, (account_number, limit))
-        results = []
-        for row in rows:
-            results.append({
-                "timestamp": row.timestamp,
-                "transaction_id": row.transaction_id,
-                "amount": row.amount,
-                "currency": row.currency,
-                "merchant": row.merchant,
-                "status": row.status
-            })
-        return results
+        found = 0
+        bucket = month_bucket(datetime.utcnow())
+        for _ in range(max_buckets):
+            rows = execute(session, SELECT_RECENT_TRANSACTIONS, (account_number, bucket, limit - found),
+                           execution_profile=profile)
+            for item in rows:
+                items.append(item)
+                found += count_rows(item, result_mode)
+            if found >= limit:
+                break
+            bucket = previous_bucket(bucket)
+        return finish_rows(items, result_mode, _transaction_dict)
     except Exception as e:
         print(f"Error en get_recent_transactions: {e}")
-        return []
+        return finish_rows([], result_mode, _transaction_dict)
 
 
 
 #  3. Obtener transacciones en un rango de fechas
 
-def get_transactions_in_range(session, account_number, start_ts, end_ts):
-    """
-    Recupera transacciones de una cuenta entre start_ts y end_ts.
+def get_transactions_in_range(session, account_number, start_ts, end_ts, result_mode="dict"):
     """
-    query = """
-        SELECT timestamp, transaction_id, amount, currency, merchant, status 
-        FROM transaction_history
-        WHERE account_number = %s
-        AND timestamp >= %s AND timestamp <= %s
+    Recupera transacciones de una cuenta entre start_ts y end_ts (más
+    recientes primero).
+    Divide el rango en buckets mensuales, los consulta en paralelo y
+    concatena los resultados en orden.
+    result_mode: "dict", "record" o "columnar" (ver cassandra_columnar).
     """
+    profile = execution_profile_for(session, result_mode)
     try:
-        rows = session.execute(query, (account_number, start_ts, end_ts))
-        results = []
-        for row in rows:
-            results.append({
-                "timestamp": row.timestamp,
-                "transaction_id": row.transaction_id,
-                "amount": row.amount,
-                "currency": row.currency,
-                "merchant": row.merchant,
-                "status": row.status
-            })
-        return results
+        futures = [
+            session.execute_async(bind(session, SELECT_TRANSACTIONS_IN_RANGE, (
+                account_number, bucket, start_ts, end_ts
+            )), execution_profile=profile)
+            for bucket in month_buckets(start_ts, end_ts)
+        ]
+        items = []
+        for future in futures:
+            items.extend(future.result())
+        return finish_rows(items, result_mode, _transaction_dict)
     except Exception as e:
         print(f"Error en get_transactions_in_range: {e}")
-        return []
+        return finish_rows([], result_mode, _transaction_dict)
 
 
 
 #  4. Obtener totales diarios de una cuenta
 
+def read_daily_totals(session, account_number, day_date):
+    """
+    Lectura de get_daily_totals sin manejo de errores. Devuelve
+    (totales o None, congelado): congelado indica que la fila viene de
+    daily_totals y ya no cambia.
+    """
+    row = execute(session, SELECT_DAILY_TOTAL, (account_number, day_date)).one()
+    if row:
+        return _daily_totals_dict(account_number, day_date, row), True
+    row = execute(session, SELECT_DAILY_TOTALS_COUNTERS, (account_number, day_date)).one()
+    if row:
+        return _daily_totals_dict(account_number, day_date, row, from_counters=True), False
+    return None, False
+
+
 def get_daily_totals(session, account_number, day_date):
     """
     Recupera total del día de una cuenta (monto y número de transacciones).
-    """
-    query = """
-        SELECT total_amount, transaction_count
-        FROM daily_totals
-        WHERE account_number = %s AND date = %s
+    Los días cerrados se leen de daily_totals (congelados por el rollup);
+    si el día aún no se congela se leen los contadores.
     """
     try:
-        row = session.execute(query, (account_number, day_date)).one()
-        if row:
-            return {
-                "account_number": account_number,
-                "date": day_date,
-                "total_amount": row.total_amount,
-                "transaction_count": row.transaction_count
-            }
-        return None
+        return read_daily_totals(session, account_number, day_date)[0]
     except Exception as e:
         print(f"Error en get_daily_totals: {e}")
         return None
@@ -128,25 +557,15 @@ def get_daily_totals(session, account_number, day_date):
 
 def insert_alert(session, account_number, transaction_id, reason):
     """
-    Inserta una alerta en la tabla alerts.
+    Inserta una alerta en la tabla alerts, en alerts_by_account
+    (consulta por cuenta) y en alerts_by_time (feed global por día)
+    en un mismo batch LOGGED.
     """
-    query = """
-        INSERT INTO alerts (
-            alert_id, timestamp, account_number, transaction_id, reason
-        ) VALUES (%s, %s, %s, %s, %s)
-    """
-
     alert_id = uuid.uuid4()
     now = datetime.utcnow()
 
     try:
-        session.execute(query, (
-            alert_id,
-            now,
-            account_number,
-            transaction_id,
-            reason
-        ))
+        session.execute(alert_batch(session, alert_id, now, account_number, transaction_id, reason))
         return {"alert_id": alert_id, "timestamp": now}
     except Exception as e:
         print(f"Error insertando alerta: {e}")
@@ -156,27 +575,16 @@ def insert_alert(session, account_number, transaction_id, reason):
 
 #  6. Obtener alertas por cuenta
 
-def get_alerts_by_account(session, account_number):
-    """
-    Recupera todas las alertas asociadas a una cuenta.
+def get_alerts_by_account(session, account_number, start_ts=None, end_ts=None, limit=None):
     """
-    query = """
-        SELECT alert_id, timestamp, transaction_id, reason
-        FROM alerts
-        WHERE account_number = %s
+    Recupera las alertas de una cuenta (más recientes primero) desde
+    alerts_by_account, con rango de fechas y límite opcionales.
     """
+    query, params = alerts_by_account_query(account_number, start_ts, end_ts, limit)
 
     try:
-        rows = session.execute(query, (account_number,))
-        results = []
-        for row in rows:
-            results.append({
-                "alert_id": row.alert_id,
-                "timestamp": row.timestamp,
-                "transaction_id": row.transaction_id,
-                "reason": row.reason
-            })
-        return results
+        rows = execute(session, query, params)
+        return [_alert_dict(row) for row in rows]
     except Exception as e:
         print(f"Error en get_alerts_by_account: {e}")
         return []
@@ -185,28 +593,378 @@ def get_alerts_by_account(session, account_number):
 
 #  7. Obtener últimas N alertas globales
 
-def get_latest_alerts(session, limit=20):
+def get_latest_alerts(session, limit=20, max_days=30):
     """
-    Devuelve las últimas alertas generales registradas.
-    (No hay ORDER en Cassandra, así que se filtra por timestamp después.)
+    Devuelve las últimas alertas generales registradas, de la más
+    reciente a la más antigua.
+    Recorre los buckets diarios de alerts_by_time hacia atrás (desde hoy,
+    hasta max_days) hasta juntar `limit` alertas.
     """
-    query = "SELECT alert_id, timestamp, account_number, transaction_id, reason FROM alerts LIMIT 200"
-
     try:
-        rows = list(session.execute(query))
-        rows.sort(key=lambda r: r.timestamp, reverse=True)
-        rows = rows[:limit]
-
         results = []
-        for row in rows:
-            results.append({
-                "alert_id": row.alert_id,
-                "timestamp": row.timestamp,
-                "account_number": row.account_number,
-                "transaction_id": row.transaction_id,
-                "reason": row.reason
-            })
+        day = datetime.utcnow().date()
+        for _ in range(max_days):
+            rows = execute(session, SELECT_LATEST_ALERTS, (day, limit - len(results)))
+            results.extend(_alert_dict(row) for row in rows)
+            if len(results) >= limit:
+                break
+            day -= timedelta(days=1)
         return results
     except Exception as e:
         print(f"Error en get_latest_alerts: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+
+#  7.1 Obtener el payload original de una transacción
+
+def get_transaction_payload(session, transaction_id):
+    """
+    Lee y descomprime el raw_payload de una transacción (solo cuando se
+    necesita; las lecturas de historial no lo traen).
+    """
+    try:
+        row = execute(session, SELECT_TRANSACTION_PAYLOAD, (transaction_id,)).one()
+        return decode_payload(row.payload) if row else None
+    except Exception as e:
+        print(f"Error en get_transaction_payload: {e}")
+        return None
+
+
+
+#  7.2 Resolver transacciones por transaction_id
+
+def get_transaction_by_id(session, transaction_id):
+    """
+    Lectura puntual de una transacción en transactions_by_id.
+    """
+    try:
+        row = execute(session, SELECT_TRANSACTION_BY_ID, (transaction_id,)).one()
+        return _transaction_by_id_dict(row) if row else None
+    except Exception as e:
+        print(f"Error en get_transaction_by_id: {e}")
+        return None
+
+
+def get_transactions_by_ids(session, transaction_ids, concurrency=100):
+    """
+    Resuelve muchas transacciones en paralelo (una lectura puntual por id,
+    con hasta `concurrency` en vuelo). Devuelve {transaction_id: dict};
+    los ids inexistentes o con error quedan en None.
+    """
+    transaction_ids = list(transaction_ids)
+    results = execute_concurrent_with_args(
+        session,
+        prepare(session, SELECT_TRANSACTION_BY_ID),
+        [(transaction_id,) for transaction_id in transaction_ids],
+        concurrency=concurrency,
+        raise_on_first_error=False
+    )
+
+    found = {}
+    for transaction_id, (success, result) in zip(transaction_ids, results):
+        if not success:
+            print(f"Error en get_transactions_by_ids ({transaction_id}): {result}")
+            found[transaction_id] = None
+            continue
+        row = result.one()
+        found[transaction_id] = _transaction_by_id_dict(row) if row else None
+    return found
+
+
+
+#  7.3 Serie diaria de un comercio
+
+def _merchant_series(merchant, rows):
+    """
+    Agrupa las filas (día, estado) de merchant_daily_totals y
+    merchant_daily_totals_v1 en un dict por día con el total y el desglose
+    por estado, ordenado por día. Las filas del mismo (día, estado) se suman.
+    """
+    days = {}
+    for row in rows:
+        day_date = row.day.date() if hasattr(row.day, "date") else row.day
+        totals = days.setdefault(day_date, {
+            "merchant": merchant,
+            "date": day_date,
+            "total_amount": from_minor_units(0),
+            "transaction_count": 0,
+            "by_status": {}
+        })
+        amount = from_minor_units(row.amount_minor or 0)
+        count = row.transaction_count or 0
+        totals["total_amount"] += amount
+        totals["transaction_count"] += count
+        by_status = totals["by_status"].setdefault(row.status, {
+            "total_amount": from_minor_units(0),
+            "transaction_count": 0
+        })
+        by_status["total_amount"] += amount
+        by_status["transaction_count"] += count
+    return [days[day_date] for day_date in sorted(days)]
+
+
+def get_merchant_daily_totals(session, merchant, start_day, end_day):
+    """
+    Serie diaria del comercio entre start_day y end_day (inclusive), del
+    día más antiguo al más reciente. Cada día trae el total y el desglose
+    por estado (p. ej. cuántos "declined"). Solo aparecen días con
+    actividad. Se lee una partición por mes de los contadores y de los
+    totales copiados de v1, en paralelo.
+    """
+    try:
+        futures = [
+            session.execute_async(bind(session, query, (merchant, bucket, start_day, end_day)))
+            for bucket in month_buckets(start_day, end_day)
+            for query in (SELECT_MERCHANT_DAILY_TOTALS, SELECT_MERCHANT_DAILY_TOTALS_V1)
+        ]
+        return _merchant_series(merchant, (row for future in futures for row in future.result()))
+    except Exception as e:
+        print(f"Error en get_merchant_daily_totals: {e}")
+        return []
+
+
+
+#  8. Recorrido por páginas de transacciones (streaming y reanudable)
+#
+#  Los iter_* devuelven un generador que pide las filas al servidor de
+#  fetch_size en fetch_size (paging del driver), sin armar la lista completa.
+#  Los page_* devuelven (filas, paging_state): el paging_state es un token
+#  opaco (str) que se pasa en la siguiente llamada para continuar.
+
+def encode_paging_state(bucket, driver_state, oldest_bucket):
+    """
+    Token opaco: bucket actual, bucket más antiguo permitido (el límite
+    se conserva entre páginas) y el paging_state del driver.
+    """
+    raw = struct.pack(">ii", bucket, oldest_bucket) + (driver_state or b"")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_paging_state(paging_state):
+    """
+    Devuelve (bucket, driver_state, oldest_bucket).
+    """
+    raw = base64.urlsafe_b64decode(paging_state.encode("ascii"))
+    bucket, oldest_bucket = struct.unpack(">ii", raw[:8])
+    return bucket, raw[8:] or None, oldest_bucket
+
+
+def _recent_buckets(max_buckets, paging_state=None):
+    """
+    Buckets a recorrer, del más reciente al más antiguo. Al reanudar se
+    continúa desde el bucket del paging_state hasta el límite que fijó la
+    primera página (max_buckets meses desde ese momento), no se abre una
+    ventana nueva.
+    """
+    bucket = month_bucket(datetime.utcnow())
+    if paging_state is not None:
+        bucket, _driver_state, oldest_bucket = decode_paging_state(paging_state)
+        buckets = []
+        while bucket >= oldest_bucket:
+            buckets.append(bucket)
+            bucket = previous_bucket(bucket)
+        return buckets
+    buckets = []
+    for _ in range(max_buckets):
+        buckets.append(bucket)
+        bucket = previous_bucket(bucket)
+    return buckets
+
+
+def _range_params(account_number, start_ts, end_ts):
+    return lambda bucket: (account_number, bucket, start_ts, end_ts)
+
+
+def _recent_params(account_number):
+    return lambda bucket: (account_number, bucket)
+
+
+def _iter_buckets(session, query, buckets, params, fetch_size):
+    for bucket in buckets:
+        statement = bind(session, query, params(bucket))
+        statement.fetch_size = fetch_size
+        for row in session.execute(statement):
+            yield _transaction_dict(row)
+
+
+def _fetch_page(session, query, buckets, params, page_size, paging_state):
+    """
+    Llena una página recorriendo los buckets en orden; devuelve
+    (filas, paging_state) con paging_state=None al terminar.
+    """
+    driver_state = None
+    if paging_state is not None:
+        bucket, driver_state, _oldest_bucket = decode_paging_state(paging_state)
+        buckets = buckets[buckets.index(bucket):] if bucket in buckets else []
+    if not buckets:
+        return [], None
+    oldest_bucket = buckets[-1]
+
+    rows = []
+    for position, bucket in enumerate(buckets):
+        statement = bind(session, query, params(bucket))
+        statement.fetch_size = page_size - len(rows)
+        result = session.execute(statement, paging_state=driver_state)
+        driver_state = None
+        rows.extend(_transaction_dict(row) for row in result.current_rows)
+
+        if result.paging_state is not None:
+            return rows, encode_paging_state(bucket, result.paging_state, oldest_bucket)
+        if len(rows) >= page_size:
+            remaining = buckets[position + 1:]
+            return rows, encode_paging_state(remaining[0], None, oldest_bucket) if remaining else None
+    return rows, None
+
+
+def iter_transactions_in_range(session, account_number, start_ts, end_ts, fetch_size=500):
+    """
+    Generador de las transacciones de una cuenta entre start_ts y end_ts
+    (más recientes primero), paginado por el driver.
+    """
+    return _iter_buckets(
+        session, SELECT_TRANSACTIONS_IN_RANGE, month_buckets(start_ts, end_ts),
+        _range_params(account_number, start_ts, end_ts), fetch_size
+    )
+
+
+def iter_recent_transactions(session, account_number, fetch_size=500, max_buckets=RECENT_MAX_BUCKETS):
+    """
+    Generador de las transacciones de una cuenta, de la más reciente a la
+    más antigua (hasta max_buckets meses).
+    """
+    return _iter_buckets(
+        session, SELECT_TRANSACTIONS_BY_BUCKET, _recent_buckets(max_buckets),
+        _recent_params(account_number), fetch_size
+    )
+
+
+def page_transactions_in_range(session, account_number, start_ts, end_ts,
+                               page_size=100, paging_state=None):
+    """
+    Devuelve una página (filas, paging_state) de get_transactions_in_range.
+    """
+    return _fetch_page(
+        session, SELECT_TRANSACTIONS_IN_RANGE, month_buckets(start_ts, end_ts),
+        _range_params(account_number, start_ts, end_ts), page_size, paging_state
+    )
+
+
+def page_recent_transactions(session, account_number, page_size=100, paging_state=None,
+                             max_buckets=RECENT_MAX_BUCKETS):
+    """
+    Devuelve una página (filas, paging_state) de las transacciones más
+    recientes de la cuenta.
+    """
+    return _fetch_page(
+        session, SELECT_TRANSACTIONS_BY_BUCKET, _recent_buckets(max_buckets, paging_state),
+        _recent_params(account_number), page_size, paging_state
+    )
+
+
+
+#  9. Lecturas de muchas cuentas a la vez
+#
+#  Los *_many lanzan una lectura por partición con hasta `concurrency`
+#  peticiones en vuelo (las sentencias preparadas llevan routing key, así
+#  que el balanceo token-aware las envía a una réplica dueña). Devuelven
+#  (resultados, errores): dos dicts por cuenta; una cuenta con error solo
+#  aparece en errores, con la excepción correspondiente.
+
+def _read_many(session, query, params_by_key, concurrency):
+    """
+    Ejecuta `query` para cada (clave, parámetros) en paralelo y produce
+    (clave, éxito, resultado) en el mismo orden.
+    """
+    keys = list(params_by_key)
+    results = execute_concurrent_with_args(
+        session,
+        prepare(session, query),
+        [params_by_key[key] for key in keys],
+        concurrency=concurrency,
+        raise_on_first_error=False
+    )
+    for key, (success, result) in zip(keys, results):
+        yield key, success, result
+
+
+def get_recent_transactions_many(session, account_numbers, limit=20, max_buckets=RECENT_MAX_BUCKETS,
+                                 concurrency=100):
+    """
+    get_recent_transactions para una lista de cuentas. Se avanza por rondas
+    de bucket mensual: en cada ronda solo se consultan las cuentas que aún
+    no juntan `limit` transacciones.
+    """
+    results = {account_number: [] for account_number in account_numbers}
+    errors = {}
+
+    pending = list(results)
+    bucket = month_bucket(datetime.utcnow())
+    for _ in range(max_buckets):
+        if not pending:
+            break
+        params = {
+            account_number: (account_number, bucket, limit - len(results[account_number]))
+            for account_number in pending
+        }
+        pending = []
+        for account_number, success, result in _read_many(session, SELECT_RECENT_TRANSACTIONS,
+                                                          params, concurrency):
+            if not success:
+                errors[account_number] = result
+                del results[account_number]
+                continue
+            results[account_number].extend(_transaction_dict(row) for row in result)
+            if len(results[account_number]) < limit:
+                pending.append(account_number)
+        bucket = previous_bucket(bucket)
+
+    return results, errors
+
+
+def daily_totals_keys(account_numbers, day_dates):
+    """
+    Pares (cuenta, día) de get_daily_totals_many. day_dates es un día o un
+    iterable de días; con un solo día los resultados se indexan por
+    cuenta (single=True), con varios por (cuenta, día).
+    """
+    single = isinstance(day_dates, date)
+    days = [day_dates] if single else list(day_dates)
+    return [(account_number, day_date) for account_number in account_numbers for day_date in days], single
+
+
+def get_daily_totals_many(session, account_numbers, day_dates, concurrency=100):
+    """
+    get_daily_totals para una lista de cuentas en uno o varios días
+    (day_dates: un día o un iterable de días). Los pares sin fila en
+    daily_totals se leen de los contadores en una segunda ronda; los que
+    no tienen actividad quedan en None.
+
+    Con un solo día los dicts se indexan por cuenta; con un iterable de
+    días, por (cuenta, día).
+    """
+    keys, single = daily_totals_keys(account_numbers, day_dates)
+    results = {}
+    errors = {}
+
+    params = {key: key for key in keys}
+    missing = {}
+    for key, success, result in _read_many(session, SELECT_DAILY_TOTAL, params, concurrency):
+        if not success:
+            errors[key] = result
+        elif result.current_rows:
+            results[key] = _daily_totals_dict(key[0], key[1], result.one())
+        else:
+            missing[key] = key
+
+    for key, success, result in _read_many(session, SELECT_DAILY_TOTALS_COUNTERS, missing, concurrency):
+        if not success:
+            errors[key] = result
+            continue
+        row = result.one()
+        results[key] = _daily_totals_dict(key[0], key[1], row, from_counters=True) if row else None
+
+    if single:
+        results = {key[0]: value for key, value in results.items()}
+        errors = {key[0]: value for key, value in errors.items()}
+    return results, errors
@@ -0,0 +1,118 @@
+"""
+Cassandra/cassandra_rollup.py
+Congela los días cerrados de daily_totals_counters en daily_totals.
+
+Para cada día se leen las cuentas con actividad (daily_active_accounts),
+se leen su contador y sus totales copiados de v1 (daily_totals_v1, ver
+Cassandra/cassandra_migrate.py) y se escribe la suma en daily_totals.
+El proceso es idempotente: si llegan transacciones tardías de un día ya
+congelado basta con volver a ejecutarlo para ese día.
+
+Uso:
+
+    python -m Cassandra.cassandra_rollup                 # ayer (UTC)
+    python -m Cassandra.cassandra_rollup --day 2025-11-09 --days 7
+"""
+
+import argparse
+from datetime import datetime, date, timedelta
+
+from cassandra.concurrent import execute_concurrent_with_args
+
+from Cassandra.cassandra_queries import DAILY_ACTIVE_SHARDS, SELECT_DAILY_TOTALS_V1, from_minor_units
+from Cassandra.cassandra_statements import execute, prepare
+
+
+SELECT_ACTIVE_ACCOUNTS = """
+    SELECT account_number
+    FROM daily_active_accounts
+    WHERE date = ? AND shard = ?
+"""
+
+SELECT_COUNTERS = """
+    SELECT account_number, amount_minor, transaction_count
+    FROM daily_totals_counters
+    WHERE account_number = ? AND date = ?
+"""
+
+INSERT_DAILY_TOTAL = """
+    INSERT INTO daily_totals (account_number, date, total_amount, transaction_count)
+    VALUES (?, ?, ?, ?)
+"""
+
+
+def frozen_daily_total(account_number, day_date, counters, v1_totals):
+    """
+    Fila de daily_totals (cuenta, día, monto, número) con la suma del
+    contador y de los totales de v1; None si no hay ninguno de los dos.
+    """
+    rows = [row for row in (counters, v1_totals) if row is not None]
+    if not rows:
+        return None
+    return (
+        account_number,
+        day_date,
+        from_minor_units(sum(row.amount_minor or 0 for row in rows)),
+        sum(row.transaction_count or 0 for row in rows)
+    )
+
+
+def rollup_daily_totals(session, day_date, concurrency=50):
+    """
+    Congela en daily_totals los contadores de todas las cuentas con
+    actividad en day_date. Solo se permiten días cerrados (anteriores a
+    hoy en UTC). Devuelve el número de cuentas escritas.
+    """
+    if day_date >= datetime.utcnow().date():
+        raise ValueError(f"El día {day_date} aún no está cerrado")
+
+    accounts = []
+    for shard in range(DAILY_ACTIVE_SHARDS):
+        rows = execute(session, SELECT_ACTIVE_ACCOUNTS, (day_date, shard))
+        accounts.extend(row.account_number for row in rows)
+
+    params = [(account_number, day_date) for account_number in accounts]
+    counters = execute_concurrent_with_args(
+        session, prepare(session, SELECT_COUNTERS), params, concurrency=concurrency
+    )
+    v1_totals = execute_concurrent_with_args(
+        session, prepare(session, SELECT_DAILY_TOTALS_V1), params, concurrency=concurrency
+    )
+
+    totals = []
+    for account_number, (counters_ok, counters_rows), (v1_ok, v1_rows) in zip(accounts, counters, v1_totals):
+        # Si falla una de las dos lecturas la cuenta se deja para otra pasada
+        if not (counters_ok and v1_ok):
+            continue
+        total = frozen_daily_total(account_number, day_date, counters_rows.one(), v1_rows.one())
+        if total is not None:
+            totals.append(total)
+
+    execute_concurrent_with_args(
+        session, prepare(session, INSERT_DAILY_TOTAL), totals, concurrency=concurrency
+    )
+    return len(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Congela los días cerrados de daily_totals_counters en daily_totals."
+    )
+    parser.add_argument("--day", type=date.fromisoformat,
+                        help="Último día a congelar (YYYY-MM-DD). Por defecto ayer (UTC).")
+    parser.add_argument("--days", type=int, default=1,
+                        help="Número de días hacia atrás a congelar")
+    args = parser.parse_args()
+
+    from connect import get_cassandra_session
+    _cluster, session = get_cassandra_session()
+
+    last_day = args.day or (datetime.utcnow().date() - timedelta(days=1))
+    for offset in range(args.days):
+        day_date = last_day - timedelta(days=offset)
+        count = rollup_daily_totals(session, day_date)
+        print(f"{day_date}: {count} cuentas congeladas en daily_totals")
+
+
+if __name__ == "__main__":
+    main()
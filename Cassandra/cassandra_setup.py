@@ -1,3 +1,16 @@
+from Cassandra.cassandra_statements import reset_statements
+
+
+def create_keyspace(session, keyspace, replication_factor=1):
+    """
+    Crea el KEYSPACE si no existe.
+    """
+    session.execute(f"""
+        CREATE KEYSPACE IF NOT EXISTS {keyspace}
+        WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': {replication_factor}}}
+    """)
+
+
 def create_tables(session):
     """
     Crea las tablas en Cassandra
@@ -8,7 +21,8 @@ def create_tables(session):
 
     queries = [
 
-        # 1. HISTORIAL DE TRANSACCIONES (principal para detección de anomalías)
+        # 1. HISTORIAL DE TRANSACCIONES (versión 1, datos previos; se copian a v2
+        #    con python -m Cassandra.cassandra_migrate)
         """
         CREATE TABLE IF NOT EXISTS transaction_history (
             account_number text,
@@ -23,6 +37,49 @@ def create_tables(session):
         ) WITH CLUSTERING ORDER BY (timestamp DESC);
         """,
 
+        # 1.1 HISTORIAL DE TRANSACCIONES v2 (principal para detección de anomalías)
+        # Partición por (cuenta, mes) para acotar su tamaño; event_id (timeuuid)
+        # evita que dos transacciones del mismo milisegundo se sobrescriban.
+        """
+        CREATE TABLE IF NOT EXISTS transaction_history_v2 (
+            account_number text,
+            month_bucket int,
+            event_id timeuuid,
+            timestamp timestamp,
+            transaction_id uuid,
+            amount decimal,
+            currency text,
+            merchant text,
+            status text,
+            PRIMARY KEY ((account_number, month_bucket), event_id)
+        ) WITH CLUSTERING ORDER BY (event_id DESC);
+        """,
+
+        # 1.2 ÍNDICE POR transaction_id (resolución directa desde alertas)
+        """
+        CREATE TABLE IF NOT EXISTS transactions_by_id (
+            transaction_id uuid,
+            account_number text,
+            month_bucket int,
+            event_id timeuuid,
+            timestamp timestamp,
+            amount decimal,
+            currency text,
+            merchant text,
+            status text,
+            PRIMARY KEY (transaction_id)
+        );
+        """,
+
+        # 1.3 PAYLOAD ORIGINAL DE CADA TRANSACCIÓN (comprimido, se lee bajo demanda)
+        """
+        CREATE TABLE IF NOT EXISTS transaction_payloads (
+            transaction_id uuid,
+            payload blob,
+            PRIMARY KEY (transaction_id)
+        );
+        """,
+
         # 2. TOTALES POR DÍA (reporting y cálculos agregados)
         """
         CREATE TABLE IF NOT EXISTS daily_totals (
@@ -34,6 +91,68 @@ def create_tables(session):
         );
         """,
 
+        # 2.1 CONTADORES DIARIOS (se actualizan en cada transacción)
+        """
+        CREATE TABLE IF NOT EXISTS daily_totals_counters (
+            account_number text,
+            date date,
+            amount_minor counter,
+            transaction_count counter,
+            PRIMARY KEY ((account_number), date)
+        );
+        """,
+
+        # 2.2 CUENTAS CON ACTIVIDAD POR DÍA (entrada del rollup a daily_totals)
+        """
+        CREATE TABLE IF NOT EXISTS daily_active_accounts (
+            date date,
+            shard int,
+            account_number text,
+            PRIMARY KEY ((date, shard), account_number)
+        );
+        """,
+
+        # 2.3 CONTADORES DIARIOS POR COMERCIO Y ESTADO (monitoreo de comercios)
+        """
+        CREATE TABLE IF NOT EXISTS merchant_daily_totals (
+            merchant text,
+            month_bucket int,
+            day date,
+            status text,
+            amount_minor counter,
+            transaction_count counter,
+            PRIMARY KEY ((merchant, month_bucket), day, status)
+        );
+        """,
+
+        # 2.4 TOTALES DE LA VERSIÓN 1 (los escribe Cassandra/cassandra_migrate.py
+        #     con valores calculados, no incrementos: repetir la copia los
+        #     sobrescribe igual). El rollup los suma a los contadores
+        """
+        CREATE TABLE IF NOT EXISTS daily_totals_v1 (
+            account_number text,
+            date date,
+            amount_minor bigint,
+            transaction_count int,
+            PRIMARY KEY ((account_number), date)
+        );
+        """,
+
+        # 2.5 TOTALES DE LA VERSIÓN 1 POR COMERCIO; una fila por cuenta para
+        #     que cada rango de la copia escriba solo lo suyo
+        """
+        CREATE TABLE IF NOT EXISTS merchant_daily_totals_v1 (
+            merchant text,
+            month_bucket int,
+            day date,
+            status text,
+            account_number text,
+            amount_minor bigint,
+            transaction_count int,
+            PRIMARY KEY ((merchant, month_bucket), day, status, account_number)
+        );
+        """,
+
         # 3. ALERTAS DE FRAUDE (excesos, ráfagas, etc.)
         """
         CREATE TABLE IF NOT EXISTS alerts (
@@ -44,6 +163,31 @@ def create_tables(session):
             reason text,
             PRIMARY KEY (alert_id)
         );
+        """,
+
+        # 4. ALERTAS POR CUENTA (consulta de una sola partición)
+        """
+        CREATE TABLE IF NOT EXISTS alerts_by_account (
+            account_number text,
+            timestamp timestamp,
+            alert_id uuid,
+            transaction_id uuid,
+            reason text,
+            PRIMARY KEY ((account_number), timestamp, alert_id)
+        ) WITH CLUSTERING ORDER BY (timestamp DESC, alert_id ASC);
+        """,
+
+        # 5. FEED GLOBAL DE ALERTAS POR DÍA (últimas alertas, más recientes primero)
+        """
+        CREATE TABLE IF NOT EXISTS alerts_by_time (
+            day_bucket date,
+            timestamp timestamp,
+            alert_id uuid,
+            account_number text,
+            transaction_id uuid,
+            reason text,
+            PRIMARY KEY ((day_bucket), timestamp, alert_id)
+        ) WITH CLUSTERING ORDER BY (timestamp DESC, alert_id ASC);
         """
     ]
 
@@ -53,4 +197,17 @@ def create_tables(session):
         except Exception as e:
             print(f"Error creando tabla: {e}")
 
+    # El esquema cambió: las sentencias preparadas se vuelven a preparar
+    reset_statements(session)
+
     print("Tablas de Cassandra creadas/verificadas exitosamente.")
+
+
+def main():
+    from connect import bootstrap_cassandra
+
+    bootstrap_cassandra()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Cassandra/cassandra_statements.py
+Registro de sentencias preparadas por sesión de Cassandra.
+
+Cada consulta se prepara una sola vez por sesión (y keyspace) y el
+PreparedStatement se reutiliza en todas las llamadas siguientes. Con
+sentencias preparadas el coordinador no vuelve a parsear el CQL y el
+driver puede enrutar por token hacia una réplica de la partición.
+"""
+
+import threading
+import weakref
+
+from cassandra import InvalidRequest
+from cassandra.protocol import PreparedQueryNotFound
+
+
+# Mensajes de InvalidRequest que indican que la sentencia preparada quedó
+# desfasada respecto del esquema (tabla o columna recreada / eliminada).
+# Cualquier otro InvalidRequest es un error de la consulta y no se reintenta.
+_SCHEMA_CHANGED_MESSAGES = ("unconfigured table", "undefined column name", "unknown identifier")
+
+
+class StatementRegistry(object):
+    """
+    Caché de PreparedStatement para una sesión, indexada por
+    (keyspace, texto de la consulta).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements = {}
+
+    def peek(self, session, query):
+        return self._statements.get((session.keyspace, query))
+
+    def get(self, session, query):
+        key = (session.keyspace, query)
+        statement = self._statements.get(key)
+        if statement is None:
+            with self._lock:
+                statement = self._statements.get(key)
+                if statement is None:
+                    statement = session.prepare(query)
+                    # Las lecturas son idempotentes: el driver puede
+                    # reintentarlas o lanzar ejecuciones especulativas
+                    if query.lstrip().upper().startswith("SELECT"):
+                        statement.is_idempotent = True
+                    self._statements[key] = statement
+        return statement
+
+    def invalidate(self, query=None):
+        with self._lock:
+            if query is None:
+                self._statements.clear()
+            else:
+                for key in [k for k in self._statements if k[1] == query]:
+                    del self._statements[key]
+
+
+_registries = weakref.WeakKeyDictionary()
+_registries_lock = threading.Lock()
+
+
+def get_registry(session):
+    """
+    Devuelve (o crea) el registro de sentencias de la sesión.
+    """
+    registry = _registries.get(session)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.get(session)
+            if registry is None:
+                # Al reconectar un nodo el driver ya vuelve a preparar las
+                # sentencias (reprepare_on_up): no hace falta descartarlas
+                registry = StatementRegistry()
+                _registries[session] = registry
+    return registry
+
+
+def prepare(session, query):
+    """
+    Devuelve el PreparedStatement de la consulta, preparándolo solo
+    la primera vez.
+    """
+    return get_registry(session).get(session, query)
+
+
+def prepared_or_none(session, query):
+    """
+    Devuelve el PreparedStatement si ya está en caché, sin preparar.
+    """
+    return get_registry(session).peek(session, query)
+
+
+def bind(session, query, params=()):
+    """
+    Devuelve un BoundStatement listo para session.execute/execute_async.
+    """
+    return prepare(session, query).bind(params)
+
+
+def is_stale_statement_error(error):
+    """
+    True si el error indica que la sentencia preparada ya no corresponde
+    al esquema (vale la pena volver a prepararla), no que la consulta
+    sea inválida.
+    """
+    if isinstance(error, PreparedQueryNotFound):
+        return True
+    if isinstance(error, InvalidRequest):
+        message = str(error).lower()
+        return any(marker in message for marker in _SCHEMA_CHANGED_MESSAGES)
+    return False
+
+
+def execute(session, query, params=(), **kwargs):
+    """
+    Ejecuta la consulta con su sentencia preparada.
+
+    Si el servidor rechaza la sentencia porque el esquema cambió (ver
+    is_stale_statement_error) se vuelve a preparar y se reintenta una sola
+    vez; los demás errores se propagan sin reintento.
+    """
+    try:
+        return session.execute(bind(session, query, params), **kwargs)
+    except (InvalidRequest, PreparedQueryNotFound) as e:
+        if not is_stale_statement_error(e):
+            raise
+        get_registry(session).invalidate(query)
+        return session.execute(bind(session, query, params), **kwargs)
+
+
+def reset_statements(session):
+    """
+    Descarta todas las sentencias preparadas de la sesión. Se llama
+    después de ejecutar DDL para que la siguiente llamada re-prepare.
+    """
+    registry = _registries.get(session)
+    if registry is not None:
+        registry.invalidate()
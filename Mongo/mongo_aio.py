@@ -0,0 +1,319 @@
+"""
+Mongo/mongo_aio.py
+Versión asyncio de Mongo/mongo_queries.py sobre AsyncMongoClient.
+
+Mismas funciones, firmas y resultados que mongo_queries, pero como
+corrutinas. Las consultas de lista tienen además una versión iter_* que
+recorre el cursor asíncrono sin armar la lista completa.
+
+    db = get_async_mongo_db()          # Mongo.mongo_client
+    tx = await get_transaction(db, tx_id)
+    async for op in iter_account_operations(db, account_id):
+        ...
+"""
+
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from bson import ObjectId
+from datetime import datetime, timedelta
+
+from Mongo.mongo_queries import (
+    KEYSET_SORT,
+    Projection,
+    _access_log_query,
+    _add_totals,
+    _collection,
+    _fields_query,
+    _keyset_page,
+    _keyset_projection,
+    _keyset_query,
+    _raw_totals_pipeline,
+    _transactions_query
+)
+
+
+# ============================================================
+# ===================== KEYSET PAGINATION =====================
+# ============================================================
+
+async def _find_list(collection, query: Dict[str, Any], projection: Projection = None,
+                     page_size: Optional[int] = None, cursor: Optional[str] = None,
+                     sort: Optional[List[Tuple[str, int]]] = None,
+                     limit: Optional[int] = None):
+    # Igual que mongo_queries._find_list
+    if page_size is None:
+        found = collection.find(query, projection)
+        if sort:
+            found = found.sort(sort)
+        if limit:
+            found = found.limit(limit)
+        return await found.to_list()
+
+    docs = await (
+        collection.find(_keyset_query(query, cursor), _keyset_projection(projection))
+        .sort(KEYSET_SORT)
+        .limit(page_size + 1)
+        .to_list()
+    )
+    return _keyset_page(docs, page_size)
+
+
+async def _iter_find(collection, query: Dict[str, Any], projection: Projection = None,
+                     sort: Optional[List[Tuple[str, int]]] = None,
+                     batch_size: int = 0) -> AsyncIterator[Any]:
+    found = collection.find(query, projection, batch_size=batch_size)
+    if sort:
+        found = found.sort(sort)
+    async with found:
+        async for doc in found:
+            yield doc
+
+
+# ============================================================
+# =============== AUTHENTICATION / USERS ======================
+# ============================================================
+
+async def create_user(db, name: str, email: str, password_hash: str, role: str):
+    return await db.users.insert_one({
+        "name": name,
+        "email": email,
+        "password_hash": password_hash,
+        "role": role,
+        "created_at": datetime.utcnow()
+    })
+
+
+async def find_user_by_email(db, email: str, raw: bool = False):
+    return await _collection(db, "users", raw).find_one({"email": email})
+
+
+async def log_user_access(db, user_id: str):
+    return await db.user_access.insert_one({
+        "user_id": ObjectId(user_id),
+        "timestamp": datetime.utcnow()
+    })
+
+
+async def get_user_access_log(db, user_id: str,
+                              start: Optional[datetime] = None,
+                              end: Optional[datetime] = None,
+                              limit: Optional[int] = None,
+                              projection: Projection = None,
+                              page_size: Optional[int] = None,
+                              cursor: Optional[str] = None,
+                              raw: bool = False):
+    return await _find_list(_collection(db, "user_access", raw), _access_log_query(user_id, start, end),
+                            projection, page_size, cursor, sort=KEYSET_SORT, limit=limit)
+
+
+def iter_user_access_log(db, user_id: str,
+                         start: Optional[datetime] = None,
+                         end: Optional[datetime] = None,
+                         projection: Projection = None,
+                         raw: bool = False):
+    return _iter_find(_collection(db, "user_access", raw), _access_log_query(user_id, start, end),
+                      projection, sort=KEYSET_SORT)
+
+
+async def update_user_password(db, user_id: str, new_pass_hash: str):
+    return await db.users.update_one(
+        {"_id": ObjectId(user_id)},
+        {"$set": {"password_hash": new_pass_hash}}
+    )
+
+
+# ============================================================
+# ===================== CLIENTS CRUD =========================
+# ============================================================
+
+async def create_client(db, client_data: Dict[str, Any]):
+    client_data["created_at"] = datetime.utcnow()
+    return await db.clients.insert_one(client_data)
+
+
+async def get_client(db, client_id: str, raw: bool = False):
+    return await _collection(db, "clients", raw).find_one({"_id": ObjectId(client_id)})
+
+
+async def update_client(db, client_id: str, updated_data: Dict[str, Any]):
+    return await db.clients.update_one(
+        {"_id": ObjectId(client_id)},
+        {"$set": updated_data}
+    )
+
+
+async def delete_client(db, client_id: str):
+    return await db.clients.delete_one({"_id": ObjectId(client_id)})
+
+
+async def search_client_by_identifier(db, value: str, raw: bool = False):
+    return await _collection(db, "clients", raw).find({
+        "$or": [
+            {"email": value},
+            {"curp": value}
+        ]
+    }).to_list()
+
+
+# ============================================================
+# ==================== ACCOUNTS CRUD =========================
+# ============================================================
+
+async def create_account(db, client_id: str, account_type: str, balance: float):
+    return await db.accounts.insert_one({
+        "client_id": ObjectId(client_id),
+        "account_type": account_type,
+        "balance": balance,
+        "created_at": datetime.utcnow()
+    })
+
+
+async def get_account(db, account_id: str, raw: bool = False):
+    return await _collection(db, "accounts", raw).find_one({"_id": ObjectId(account_id)})
+
+
+async def update_account(db, account_id: str, new_data: Dict[str, Any]):
+    return await db.accounts.update_one(
+        {"_id": ObjectId(account_id)},
+        {"$set": new_data}
+    )
+
+
+async def delete_account(db, account_id: str):
+    return await db.accounts.delete_one({"_id": ObjectId(account_id)})
+
+
+# ============================================================
+# ================= OPERATIONS ON ACCOUNTS ===================
+# ============================================================
+
+async def create_operation(db, account_id: str, op_type: str, amount: float):
+    return await db.operations.insert_one({
+        "account_id": ObjectId(account_id),
+        "type": op_type,
+        "amount": amount,
+        "timestamp": datetime.utcnow()
+    })
+
+
+async def get_account_operations(db, account_id: str,
+                                 projection: Projection = None,
+                                 page_size: Optional[int] = None,
+                                 cursor: Optional[str] = None,
+                                 raw: bool = False):
+    return await _find_list(_collection(db, "operations", raw), {"account_id": ObjectId(account_id)},
+                            projection, page_size, cursor, sort=[("timestamp", -1)])
+
+
+def iter_account_operations(db, account_id: str, projection: Projection = None, raw: bool = False):
+    return _iter_find(_collection(db, "operations", raw), {"account_id": ObjectId(account_id)},
+                      projection, sort=KEYSET_SORT)
+
+
+async def update_operation(db, op_id: str, data: Dict[str, Any]):
+    return await db.operations.update_one(
+        {"_id": ObjectId(op_id)},
+        {"$set": data}
+    )
+
+
+async def delete_operation(db, op_id: str):
+    return await db.operations.delete_one({"_id": ObjectId(op_id)})
+
+
+# ============================================================
+# =============== TRANSACTION METADATA QUERIES ===============
+# ============================================================
+
+async def insert_transaction_metadata(db, tx_data: Dict[str, Any]):
+    document = dict(tx_data)
+    document["ingested_at"] = datetime.utcnow()
+    return await db.transactions.insert_one(document)
+
+
+async def get_transaction(db, tx_id: str, raw: bool = False):
+    return await _collection(db, "transactions", raw).find_one({"_id": ObjectId(tx_id)})
+
+
+async def search_transactions(db,
+                              account_id: Optional[str] = None,
+                              merchant: Optional[str] = None,
+                              status: Optional[str] = None,
+                              projection: Projection = None,
+                              page_size: Optional[int] = None,
+                              cursor: Optional[str] = None,
+                              raw: bool = False):
+    query = _transactions_query(account_id, merchant, status)
+    return await _find_list(_collection(db, "transactions", raw), query, projection, page_size, cursor)
+
+
+def iter_transactions(db,
+                      account_id: Optional[str] = None,
+                      merchant: Optional[str] = None,
+                      status: Optional[str] = None,
+                      projection: Projection = None,
+                      raw: bool = False,
+                      batch_size: int = 0):
+    query = _transactions_query(account_id, merchant, status)
+    return _iter_find(_collection(db, "transactions", raw), query, projection, batch_size=batch_size)
+
+
+async def _raw_totals(db, account_id: str, start: datetime, end: datetime,
+                      ingested_since: Optional[datetime] = None):
+    pipeline = _raw_totals_pipeline(account_id, start, end, ingested_since)
+    result = await (await db.transactions.aggregate(pipeline)).to_list()
+    return result[0] if result else {"total_amount": 0, "count": 0}
+
+
+async def _rollup_plus_delta(db, rollup: Optional[Dict[str, Any]], account_id: str,
+                             start: datetime, end: datetime) -> Dict[str, Any]:
+    if rollup is None:
+        return await _raw_totals(db, account_id, start, end)
+    return _add_totals(rollup, await _raw_totals(db, account_id, start, end, rollup["updated_at"]))
+
+
+async def get_daily_totals(db, account_id: str, date: datetime):
+    start = datetime(date.year, date.month, date.day)
+    end = start + timedelta(days=1)
+
+    rollup = await db.daily_account_totals.find_one({"account_id": account_id, "day": start})
+    totals = await _rollup_plus_delta(db, rollup, account_id, start, end)
+    return {"total_amount": totals["total_amount"], "count": totals["count"]}
+
+
+# ============================================================
+# ======================== REPORTING ==========================
+# ============================================================
+
+async def monthly_totals_per_account(db, account_id: str, year: int, month: int):
+    start = datetime(year, month, 1)
+    end = datetime(year + (month == 12), (month % 12) + 1, 1)
+
+    rollup = await db.monthly_account_totals.find_one({"account_id": account_id, "month": start})
+    totals = await _rollup_plus_delta(db, rollup, account_id, start, end)
+    return {
+        "total_amount": totals["total_amount"],
+        "num_transactions": totals["count"]
+    }
+
+
+async def search_transactions_by_fields(db,
+                                        min_amount: Optional[float] = None,
+                                        merchant: Optional[str] = None,
+                                        date: Optional[datetime] = None,
+                                        projection: Projection = None,
+                                        page_size: Optional[int] = None,
+                                        cursor: Optional[str] = None,
+                                        raw: bool = False):
+    query = _fields_query(min_amount, merchant, date)
+    return await _find_list(_collection(db, "transactions", raw), query, projection, page_size, cursor)
+
+
+def iter_transactions_by_fields(db,
+                                min_amount: Optional[float] = None,
+                                merchant: Optional[str] = None,
+                                date: Optional[datetime] = None,
+                                projection: Projection = None,
+                                raw: bool = False,
+                                batch_size: int = 0):
+    query = _fields_query(min_amount, merchant, date)
+    return _iter_find(_collection(db, "transactions", raw), query, projection, batch_size=batch_size)
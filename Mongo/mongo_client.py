@@ -0,0 +1,155 @@
+"""
+Mongo/mongo_client.py
+Registro de clientes de MongoDB compartidos por proceso.
+
+Un MongoClient abre su propio pool de conexiones y sus hilos de monitoreo,
+así que se crea uno solo por URI y se reutiliza en cada llamada. La
+configuración sale de variables de entorno:
+
+- MONGO_URI                          (mongodb://localhost:27017)
+- MONGO_DB_NAME                      (finance)  nombre único de la base
+- MONGO_MAX_POOL_SIZE                (100)
+- MONGO_MIN_POOL_SIZE                (0)
+- MONGO_COMPRESSORS                  (zlib; p. ej. "zstd,snappy,zlib", vacío = sin compresión)
+- MONGO_CONNECT_TIMEOUT_MS           (5000)
+- MONGO_SERVER_SELECTION_TIMEOUT_MS  (5000)
+- MONGO_SOCKET_TIMEOUT_MS            (sin límite si no se define)
+- MONGO_MAX_IDLE_TIME_MS             (sin límite si no se define)
+
+Después de un fork el proceso hijo crea sus propios clientes: pymongo no
+es seguro entre procesos.
+
+get_async_mongo_client / get_async_mongo_db hacen lo mismo con
+AsyncMongoClient (ver Mongo/mongo_aio.py); cada cliente asíncrono debe
+usarse desde un solo event loop y se cierra con close_async_mongo_clients().
+AsyncMongoClient requiere pymongo >= 4.13 y se importa solo al pedir un
+cliente asíncrono, así el cliente síncrono funciona con versiones previas.
+"""
+
+import atexit
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from pymongo import MongoClient
+
+if TYPE_CHECKING:
+    from pymongo import AsyncMongoClient
+
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.getenv("MONGO_DB_NAME", "finance")
+
+_clients: Dict[str, MongoClient] = {}
+_clients_pid: Optional[int] = None
+_clients_lock = threading.Lock()
+
+_async_clients: Dict[str, "AsyncMongoClient"] = {}
+_async_clients_pid: Optional[int] = None
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def client_options() -> Dict[str, Any]:
+    """
+    Opciones del MongoClient a partir del entorno.
+    """
+    options = {
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS", None),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS", None),
+    }
+    compressors = os.getenv("MONGO_COMPRESSORS", "zlib")
+    if compressors:
+        options["compressors"] = compressors
+    return {name: value for name, value in options.items() if value is not None}
+
+
+def get_mongo_client(uri: Optional[str] = None) -> MongoClient:
+    """
+    Devuelve el MongoClient compartido del proceso para `uri`
+    (MONGO_URI por defecto). Solo la primera llamada lo crea.
+    """
+    global _clients_pid
+    uri = uri or MONGO_URI
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            # Proceso nuevo (o hijo de un fork): no se reutilizan los clientes heredados
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(uri)
+        if client is None:
+            client = MongoClient(uri, **client_options())
+            _clients[uri] = client
+        return client
+
+
+def get_mongo_db(name: Optional[str] = None, uri: Optional[str] = None):
+    """
+    Base de datos del proyecto (MONGO_DB_NAME) sobre el cliente compartido.
+    """
+    return get_mongo_client(uri)[name or DB_NAME]
+
+
+@atexit.register
+def close_mongo_clients():
+    """
+    Cierra los clientes creados por este proceso (se llama al salir).
+    """
+    global _clients_pid
+    with _clients_lock:
+        if _clients_pid == os.getpid():
+            for client in _clients.values():
+                client.close()
+        _clients.clear()
+        _clients_pid = None
+
+
+def get_async_mongo_client(uri: Optional[str] = None) -> "AsyncMongoClient":
+    """
+    Devuelve el AsyncMongoClient compartido del proceso para `uri`, con
+    las mismas opciones que get_mongo_client.
+    """
+    global _async_clients_pid
+    try:
+        from pymongo import AsyncMongoClient
+    except ImportError as e:
+        raise ImportError("El cliente asíncrono requiere pymongo >= 4.13 (pip install -U pymongo)") from e
+
+    uri = uri or MONGO_URI
+    with _clients_lock:
+        if _async_clients_pid != os.getpid():
+            _async_clients.clear()
+            _async_clients_pid = os.getpid()
+        client = _async_clients.get(uri)
+        if client is None:
+            client = AsyncMongoClient(uri, **client_options())
+            _async_clients[uri] = client
+        return client
+
+
+def get_async_mongo_db(name: Optional[str] = None, uri: Optional[str] = None):
+    """
+    Base de datos del proyecto sobre el cliente asíncrono compartido.
+    """
+    return get_async_mongo_client(uri)[name or DB_NAME]
+
+
+async def close_async_mongo_clients():
+    """
+    Cierra los clientes asíncronos de este proceso (llamar antes de
+    terminar el event loop).
+    """
+    global _async_clients_pid
+    with _clients_lock:
+        clients = list(_async_clients.values()) if _async_clients_pid == os.getpid() else []
+        _async_clients.clear()
+        _async_clients_pid = None
+    for client in clients:
+        await client.close()
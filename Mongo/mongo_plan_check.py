@@ -0,0 +1,285 @@
+"""
+Mongo/mongo_plan_check.py
+Verifica que las consultas de Mongo/mongo_queries.py usen índices.
+
+Cada función de lectura se ejecuta contra una base "grabadora" que no
+consulta nada: solo registra las operaciones (find / find_one /
+aggregate / count_documents) con su filtro, orden y pipeline. Después se
+pide el explain() de cada operación registrada a la base real y se marca
+como falla cualquier plan ganador que contenga un COLLSCAN, salvo los
+casos listados en KNOWN_SCANS (recorridos completos a propósito).
+
+Uso (después de mongo_setup):
+
+    python -m Mongo.mongo_plan_check          # código de salida 1 si hay COLLSCAN
+"""
+
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+
+from Mongo import mongo_queries as q
+
+
+# ============================================================
+# ===================== BASE GRABADORA =======================
+# ============================================================
+
+class _RecordingCursor(list):
+    """
+    Cursor vacío que registra sort/limit/skip en la operación.
+    """
+
+    def __init__(self, operation: Dict[str, Any]):
+        super().__init__()
+        self._operation = operation
+
+    def sort(self, key_or_list, direction=None):
+        if isinstance(key_or_list, str):
+            key_or_list = [(key_or_list, direction or 1)]
+        self._operation["sort"] = dict(key_or_list)
+        return self
+
+    def limit(self, count: int):
+        self._operation["limit"] = count
+        return self
+
+    def skip(self, count: int):
+        self._operation["skip"] = count
+        return self
+
+    def hint(self, index):
+        self._operation["hint"] = index
+        return self
+
+
+class _RecordingCollection:
+
+    codec_options = CodecOptions()
+
+    def __init__(self, name: str, operations: List[Dict[str, Any]]):
+        self.name = name
+        self._operations = operations
+
+    def _record(self, **operation) -> Dict[str, Any]:
+        operation["collection"] = self.name
+        self._operations.append(operation)
+        return operation
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection=None, **kwargs):
+        operation = self._record(command="find", filter=filter or {})
+        if kwargs.get("sort"):
+            _RecordingCursor(operation).sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            operation["limit"] = kwargs["limit"]
+        return _RecordingCursor(operation)
+
+    def find_one(self, filter: Optional[Dict[str, Any]] = None, *args, **kwargs):
+        operation = self._record(command="find", filter=filter or {}, limit=1)
+        if kwargs.get("sort"):
+            _RecordingCursor(operation).sort(kwargs["sort"])
+        return None
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs):
+        self._record(command="aggregate", pipeline=pipeline)
+        return iter([])
+
+    def count_documents(self, filter: Dict[str, Any], **kwargs):
+        self._record(command="aggregate", pipeline=[{"$match": filter}, {"$count": "n"}])
+        return 0
+
+    def with_options(self, **kwargs):
+        return self
+
+
+class RecordingDatabase:
+    """
+    Sustituto de la base de datos que solo registra las lecturas
+    (db.<colección> y db["<colección>"] devuelven colecciones grabadoras).
+    """
+
+    def __init__(self):
+        self._recorded: List[Dict[str, Any]] = []
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _RecordingCollection(name, self._recorded)
+
+    def __getitem__(self, name: str):
+        return _RecordingCollection(name, self._recorded)
+
+    def get_collection(self, name: str, **kwargs):
+        return _RecordingCollection(name, self._recorded)
+
+    def recorded_operations(self) -> List[Dict[str, Any]]:
+        return list(self._recorded)
+
+
+# ============================================================
+# ========================= EXPLAIN ==========================
+# ============================================================
+
+def explain_command(operation: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Comando explain equivalente a la operación registrada.
+    """
+    if operation["command"] == "aggregate":
+        return {"aggregate": operation["collection"], "pipeline": operation["pipeline"], "cursor": {}}
+
+    command = {"find": operation["collection"], "filter": operation["filter"]}
+    for field in ("sort", "limit", "skip", "hint"):
+        if field in operation:
+            command[field] = operation[field]
+    return command
+
+
+def _winning_plans(explain: Any):
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                yield value
+            else:
+                yield from _winning_plans(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from _winning_plans(value)
+
+
+def _stages(plan: Any):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def plan_stages(db, operation: Dict[str, Any]) -> List[str]:
+    """
+    Etapas de los planes ganadores de la operación.
+    """
+    explain = db.command("explain", explain_command(operation), verbosity="queryPlanner")
+    return [stage for plan in _winning_plans(explain) for stage in _stages(plan)]
+
+
+# ============================================================
+# ========================== CASOS ===========================
+# ============================================================
+
+# Casos que recorren la colección completa a propósito (sin filtros no
+# hay índice que lo evite). Se reportan, pero no cuentan como falla.
+KNOWN_SCANS = {
+    "search_transactions()": "sin filtros devuelve todas las transacciones",
+    "search_transactions_by_fields()": "sin filtros devuelve todas las transacciones",
+}
+
+
+def check_cases():
+    """
+    (nombre, función) con argumentos de ejemplo para cada lectura de
+    mongo_queries. Los ids no necesitan existir: solo importa el plan.
+    """
+    some_id = str(ObjectId())
+    day = datetime.utcnow()
+    some_cursor = q.encode_cursor({"timestamp": day, "_id": ObjectId()})
+    return [
+        ("find_user_by_email", lambda db: q.find_user_by_email(db, "plan@check.com")),
+        ("get_user_access_log", lambda db: q.get_user_access_log(db, some_id)),
+        ("get_user_access_log(limit)",
+         lambda db: q.get_user_access_log(db, some_id, limit=q.ACCESS_LOG_LIMIT)),
+        ("get_user_access_log(start, end, limit)",
+         lambda db: q.get_user_access_log(db, some_id, start=day - timedelta(days=30), end=day, limit=20)),
+        ("get_client", lambda db: q.get_client(db, some_id)),
+        ("search_client_by_identifier", lambda db: q.search_client_by_identifier(db, "plan@check.com")),
+        ("get_account", lambda db: q.get_account(db, some_id)),
+        ("get_account_operations", lambda db: q.get_account_operations(db, some_id)),
+        ("get_transaction", lambda db: q.get_transaction(db, some_id)),
+        ("search_transactions(account_id)",
+         lambda db: q.search_transactions(db, account_id=some_id)),
+        ("search_transactions(account_id, merchant, status)",
+         lambda db: q.search_transactions(db, account_id=some_id, merchant="Amazon", status="APPROVED")),
+        ("search_transactions(merchant)",
+         lambda db: q.search_transactions(db, merchant="Amazon")),
+        ("search_transactions(status)",
+         lambda db: q.search_transactions(db, status="DECLINED")),
+        ("search_transactions(merchant, status)",
+         lambda db: q.search_transactions(db, merchant="Amazon", status="DECLINED")),
+        ("search_transactions()", lambda db: q.search_transactions(db)),
+        ("get_daily_totals", lambda db: q.get_daily_totals(db, some_id, day)),
+        ("get_daily_totals (delta sobre el rollup)",
+         lambda db: q._raw_totals(db, some_id, day - timedelta(days=1), day, day - timedelta(hours=1))),
+        ("monthly_totals_per_account",
+         lambda db: q.monthly_totals_per_account(db, some_id, day.year, day.month)),
+        ("search_transactions_by_fields(merchant, date)",
+         lambda db: q.search_transactions_by_fields(db, min_amount=100, merchant="Amazon", date=day)),
+        ("search_transactions_by_fields(date)",
+         lambda db: q.search_transactions_by_fields(db, date=day)),
+        ("search_transactions_by_fields(min_amount)",
+         lambda db: q.search_transactions_by_fields(db, min_amount=100)),
+        ("search_transactions_by_fields(min_amount, date)",
+         lambda db: q.search_transactions_by_fields(db, min_amount=100, date=day)),
+        ("search_transactions_by_fields()", lambda db: q.search_transactions_by_fields(db)),
+        ("search_transactions(status, page_size, cursor)",
+         lambda db: q.search_transactions(db, status="DECLINED", page_size=50, cursor=some_cursor)),
+        ("search_transactions(account_id, page_size, cursor)",
+         lambda db: q.search_transactions(db, account_id=some_id, page_size=50, cursor=some_cursor)),
+        ("get_account_operations(page_size, cursor)",
+         lambda db: q.get_account_operations(db, some_id, page_size=50, cursor=some_cursor)),
+        ("get_user_access_log(page_size, cursor)",
+         lambda db: q.get_user_access_log(db, some_id, page_size=50, cursor=some_cursor)),
+    ]
+
+
+def check_plans(db) -> List[Dict[str, Any]]:
+    """
+    Ejecuta todos los casos y devuelve un reporte por operación:
+    {"case", "collection", "command", "stages", "collscan", "known_scan"}.
+    """
+    report = []
+    for name, call in check_cases():
+        recorder = RecordingDatabase()
+        call(recorder)
+        for operation in recorder.recorded_operations():
+            stages = plan_stages(db, operation)
+            report.append({
+                "case": name,
+                "collection": operation["collection"],
+                "command": explain_command(operation),
+                "stages": stages,
+                "collscan": "COLLSCAN" in stages,
+                "known_scan": name in KNOWN_SCANS
+            })
+    return report
+
+
+def main():
+    from connect import get_mongo_db
+
+    report = check_plans(get_mongo_db())
+    failures = [entry for entry in report if entry["collscan"] and not entry["known_scan"]]
+
+    for entry in report:
+        if entry["collscan"] and entry["known_scan"]:
+            status = "esperado"
+        else:
+            status = "COLLSCAN" if entry["collscan"] else "ok"
+        print(f"[{status:>8}] {entry['case']} ({entry['collection']}): {' > '.join(entry['stages'])}")
+        if entry["known_scan"]:
+            print(f"           recorrido completo conocido: {KNOWN_SCANS[entry['case']]}")
+
+    if failures:
+        print(f"\n{len(failures)} consulta(s) sin índice:")
+        for entry in failures:
+            print(f"  {entry['case']}: {entry['command']}")
+        sys.exit(1)
+    print("\nTodas las consultas usan índices (salvo los recorridos conocidos).")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,145 @@ Mongo/mongo_queries.py
 Consultas de MongoDB adaptadas para el sistema bancario antifraude.
 """
 
-from typing import Dict, Any, List, Optional
+import base64
+from typing import BinaryIO, Dict, Any, Iterable, List, Optional, Tuple, Union
+import bson
 from bson import ObjectId
-from datetime import datetime
+from bson.raw_bson import RawBSONDocument
+from datetime import datetime, timedelta
+
+
+Projection = Optional[Union[Dict[str, Any], List[str]]]
+
+# Orden de las listas paginadas: más recientes primero, _id desempata
+KEYSET_SORT = [("timestamp", -1), ("_id", -1)]
+
+# Límite sugerido para consultas de auditoría de get_user_access_log
+# (se pasa explícito: por omisión la función no trunca)
+ACCESS_LOG_LIMIT = 100
+
+
+# ============================================================
+# ======================== RAW BSON ===========================
+# ============================================================
+# Con raw=True las lecturas devuelven RawBSONDocument: los bytes tal como
+# llegan del servidor, que se decodifican solo al acceder a un campo.
+# doc.raw sirve para reenviarlos (archivo, otra colección) sin recodificar.
+
+def _collection(db, name: str, raw: bool = False):
+    collection = db[name]
+    if raw:
+        return collection.with_options(
+            codec_options=collection.codec_options.with_options(document_class=RawBSONDocument)
+        )
+    return collection
+
+
+def dump_raw_documents(docs: Iterable[RawBSONDocument], out: BinaryIO) -> int:
+    # Escribe los documentos como BSON concatenado (formato .bson de
+    # mongodump / mongorestore). Devuelve cuántos se escribieron.
+    count = 0
+    for doc in docs:
+        out.write(doc.raw)
+        count += 1
+    return count
+
+
+def load_raw_documents(source: BinaryIO) -> Iterable[RawBSONDocument]:
+    # Lee un archivo de BSON concatenado como RawBSONDocument (sin decodificar)
+    while True:
+        header = source.read(4)
+        if not header:
+            return
+        size = int.from_bytes(header, "little")
+        yield RawBSONDocument(header + source.read(size - 4))
+
+
+def copy_raw_documents(docs: Iterable[RawBSONDocument], collection, batch_size: int = 1000) -> int:
+    # insert_many envía los bytes de RawBSONDocument sin volver a codificar
+    count = 0
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            count += len(collection.insert_many(batch, ordered=False).inserted_ids)
+            batch = []
+    if batch:
+        count += len(collection.insert_many(batch, ordered=False).inserted_ids)
+    return count
+
+
+# ============================================================
+# ===================== KEYSET PAGINATION =====================
+# ============================================================
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    # Cursor opaco con la clave (timestamp, _id) del último documento
+    raw = bson.encode({"t": doc.get("timestamp"), "i": doc["_id"]})
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, Any]:
+    key = bson.decode(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return key["t"], key["i"]
+
+
+def _keyset_projection(projection: Projection):
+    # La página necesita timestamp y _id para armar el siguiente cursor
+    if projection is None:
+        return None
+    if not isinstance(projection, dict):
+        projection = {field: 1 for field in projection}
+    projection = dict(projection)
+    projection.pop("_id", None)
+    if any(value for value in projection.values()):
+        projection["timestamp"] = 1
+    else:
+        projection.pop("timestamp", None)
+    return projection
+
+
+def _keyset_query(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    # Documentos posteriores (en KEYSET_SORT) al cursor
+    if not cursor:
+        return query
+    last_ts, last_id = decode_cursor(cursor)
+    return {"$and": [query, {"$or": [
+        {"timestamp": {"$lt": last_ts}},
+        {"timestamp": last_ts, "_id": {"$lt": last_id}}
+    ]}]}
+
+
+def _keyset_page(docs: List[Any], page_size: int):
+    # docs trae page_size + 1 documentos si hay más páginas
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        return docs, encode_cursor(docs[-1])
+    return docs, None
+
+
+def _find_list(collection, query: Dict[str, Any], projection: Projection = None,
+               page_size: Optional[int] = None, cursor: Optional[str] = None,
+               sort: Optional[List[Tuple[str, int]]] = None,
+               limit: Optional[int] = None):
+    # Sin page_size devuelve la lista completa (comportamiento original),
+    # con a lo más `limit` documentos si se indica.
+    # Con page_size devuelve (documentos, siguiente cursor o None), en orden
+    # KEYSET_SORT, continuando después de `cursor`.
+    if page_size is None:
+        found = collection.find(query, projection)
+        if sort:
+            found = found.sort(sort)
+        if limit:
+            found = found.limit(limit)
+        return list(found)
+
+    docs = list(
+        collection.find(_keyset_query(query, cursor), _keyset_projection(projection))
+        .sort(KEYSET_SORT)
+        .limit(page_size + 1)
+    )
+    return _keyset_page(docs, page_size)
 
 
 # ============================================================
@@ -22,8 +158,8 @@ def create_user(db, name: str, email: str, password_hash: str, role: str):
     })
 
 
-def find_user_by_email(db, email: str):
-    return db.users.find_one({"email": email})
+def find_user_by_email(db, email: str, raw: bool = False):
+    return _collection(db, "users", raw).find_one({"email": email})
 
 
 def log_user_access(db, user_id: str):
@@ -33,8 +169,31 @@ def log_user_access(db, user_id: str):
     })
 
 
-def get_user_access_log(db, user_id: str):
-    return list(db.user_access.find({"user_id": ObjectId(user_id)}))
+def _access_log_query(user_id: str, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> Dict[str, Any]:
+    query = {"user_id": ObjectId(user_id)}
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lt"] = end
+    return query
+
+
+def get_user_access_log(db, user_id: str,
+                        start: Optional[datetime] = None,
+                        end: Optional[datetime] = None,
+                        limit: Optional[int] = None,
+                        projection: Projection = None,
+                        page_size: Optional[int] = None,
+                        cursor: Optional[str] = None,
+                        raw: bool = False):
+    # Accesos en [start, end), más recientes primero; sin page_size se
+    # devuelven a lo más `limit` (None = todos, como antes; p. ej.
+    # limit=ACCESS_LOG_LIMIT para acotar)
+    return _find_list(_collection(db, "user_access", raw), _access_log_query(user_id, start, end),
+                      projection, page_size, cursor, sort=KEYSET_SORT, limit=limit)
 
 
 def update_user_password(db, user_id: str, new_pass_hash: str):
@@ -53,8 +212,8 @@ def create_client(db, client_data: Dict[str, Any]):
     return db.clients.insert_one(client_data)
 
 
-def get_client(db, client_id: str):
-    return db.clients.find_one({"_id": ObjectId(client_id)})
+def get_client(db, client_id: str, raw: bool = False):
+    return _collection(db, "clients", raw).find_one({"_id": ObjectId(client_id)})
 
 
 def update_client(db, client_id: str, updated_data: Dict[str, Any]):
@@ -68,8 +227,8 @@ def delete_client(db, client_id: str):
     return db.clients.delete_one({"_id": ObjectId(client_id)})
 
 
-def search_client_by_identifier(db, value: str):
-    return list(db.clients.find({
+def search_client_by_identifier(db, value: str, raw: bool = False):
+    return list(_collection(db, "clients", raw).find({
         "$or": [
             {"email": value},
             {"curp": value}
@@ -90,8 +249,8 @@ def create_account(db, client_id: str, account_type: str, balance: float):
     })
 
 
-def get_account(db, account_id: str):
-    return db.accounts.find_one({"_id": ObjectId(account_id)})
+def get_account(db, account_id: str, raw: bool = False):
+    return _collection(db, "accounts", raw).find_one({"_id": ObjectId(account_id)})
 
 
 def update_account(db, account_id: str, new_data: Dict[str, Any]):
@@ -118,10 +277,13 @@ def create_operation(db, account_id: str, op_type: str, amount: float):
     })
 
 
-def get_account_operations(db, account_id: str):
-    return list(db.operations.find({
-        "account_id": ObjectId(account_id)
-    }).sort("timestamp", -1))
+def get_account_operations(db, account_id: str,
+                           projection: Projection = None,
+                           page_size: Optional[int] = None,
+                           cursor: Optional[str] = None,
+                           raw: bool = False):
+    return _find_list(_collection(db, "operations", raw), {"account_id": ObjectId(account_id)},
+                      projection, page_size, cursor, sort=[("timestamp", -1)])
 
 
 def update_operation(db, op_id: str, data: Dict[str, Any]):
@@ -140,18 +302,20 @@ def delete_operation(db, op_id: str):
 # ============================================================
 
 def insert_transaction_metadata(db, tx_data: Dict[str, Any]):
-    tx_data["ingested_at"] = datetime.utcnow()
-    return db.transactions.insert_one(tx_data)
+    # Se inserta una copia: el dict del llamador no recibe ingested_at ni _id.
+    # Para ingesta masiva ver Mongo.mongo_writer.TransactionMetadataWriter.
+    document = dict(tx_data)
+    document["ingested_at"] = datetime.utcnow()
+    return db.transactions.insert_one(document)
 
 
-def get_transaction(db, tx_id: str):
-    return db.transactions.find_one({"_id": ObjectId(tx_id)})
+def get_transaction(db, tx_id: str, raw: bool = False):
+    return _collection(db, "transactions", raw).find_one({"_id": ObjectId(tx_id)})
 
 
-def search_transactions(db,
-                        account_id: Optional[str] = None,
+def _transactions_query(account_id: Optional[str] = None,
                         merchant: Optional[str] = None,
-                        status: Optional[str] = None):
+                        status: Optional[str] = None) -> Dict[str, Any]:
     query = {}
     if account_id:
         query["account_id"] = account_id
@@ -159,19 +323,35 @@ def search_transactions(db,
         query["merchant"] = merchant
     if status:
         query["status"] = status
+    return query
 
-    return list(db.transactions.find(query))
 
+def search_transactions(db,
+                        account_id: Optional[str] = None,
+                        merchant: Optional[str] = None,
+                        status: Optional[str] = None,
+                        projection: Projection = None,
+                        page_size: Optional[int] = None,
+                        cursor: Optional[str] = None,
+                        raw: bool = False):
+    query = _transactions_query(account_id, merchant, status)
+    return _find_list(_collection(db, "transactions", raw), query, projection, page_size, cursor)
+
+
+def _raw_totals_pipeline(account_id: str, start: datetime, end: datetime,
+                         ingested_since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    # Suma directa sobre transactions de la cuenta en [start, end). Con
+    # ingested_since solo cuenta lo ingerido desde entonces (lo que aún no
+    # está en los rollups).
+    match = {
+        "account_id": account_id,
+        "timestamp": {"$gte": start, "$lt": end}
+    }
+    if ingested_since is not None:
+        match["ingested_at"] = {"$gte": ingested_since}
 
-def get_daily_totals(db, account_id: str, date: datetime):
-    start = datetime(date.year, date.month, date.day)
-    end = start.replace(day=start.day + 1)
-
-    pipeline = [
-        {"$match": {
-            "account_id": account_id,
-            "timestamp": {"$gte": start, "$lt": end}
-        }},
+    return [
+        {"$match": match},
         {"$group": {
             "_id": None,
             "total_amount": {"$sum": "$amount"},
@@ -179,10 +359,39 @@ def get_daily_totals(db, account_id: str, date: datetime):
         }}
     ]
 
+
+def _raw_totals(db, account_id: str, start: datetime, end: datetime,
+                ingested_since: Optional[datetime] = None):
+    pipeline = _raw_totals_pipeline(account_id, start, end, ingested_since)
     result = list(db.transactions.aggregate(pipeline))
     return result[0] if result else {"total_amount": 0, "count": 0}
 
 
+def _add_totals(rollup: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "total_amount": rollup["total_amount"] + delta["total_amount"],
+        "count": rollup["count"] + delta["count"]
+    }
+
+
+def _rollup_plus_delta(db, rollup: Optional[Dict[str, Any]], account_id: str,
+                       start: datetime, end: datetime) -> Dict[str, Any]:
+    # El rollup cubre lo ingerido antes de su updated_at; el resto se suma
+    # de transactions. Sin rollup se calcula todo desde transactions.
+    if rollup is None:
+        return _raw_totals(db, account_id, start, end)
+    return _add_totals(rollup, _raw_totals(db, account_id, start, end, rollup["updated_at"]))
+
+
+def get_daily_totals(db, account_id: str, date: datetime):
+    start = datetime(date.year, date.month, date.day)
+    end = start + timedelta(days=1)
+
+    rollup = db.daily_account_totals.find_one({"account_id": account_id, "day": start})
+    totals = _rollup_plus_delta(db, rollup, account_id, start, end)
+    return {"total_amount": totals["total_amount"], "count": totals["count"]}
+
+
 # ============================================================
 # ======================== REPORTING ==========================
 # ============================================================
@@ -191,30 +400,17 @@ def monthly_totals_per_account(db, account_id: str, year: int, month: int):
     start = datetime(year, month, 1)
     end = datetime(year + (month == 12), (month % 12) + 1, 1)
 
-    pipeline = [
-        {"$match": {
-            "account_id": account_id,
-            "timestamp": {"$gte": start, "$lt": end}
-        }},
-        {"$group": {
-            "_id": None,
-            "total_amount": {"$sum": "$amount"},
-            "num_transactions": {"$sum": 1}
-        }}
-    ]
-
-    result = list(db.transactions.aggregate(pipeline))
-    return result[0] if result else {
-        "total_amount": 0,
-        "num_transactions": 0
+    rollup = db.monthly_account_totals.find_one({"account_id": account_id, "month": start})
+    totals = _rollup_plus_delta(db, rollup, account_id, start, end)
+    return {
+        "total_amount": totals["total_amount"],
+        "num_transactions": totals["count"]
     }
 
 
-def search_transactions_by_fields(db,
-                                  min_amount: Optional[float] = None,
-                                  merchant: Optional[str] = None,
-                                  date: Optional[datetime] = None):
-
+def _fields_query(min_amount: Optional[float] = None,
+                  merchant: Optional[str] = None,
+                  date: Optional[datetime] = None) -> Dict[str, Any]:
     query = {}
     if min_amount:
         query["amount"] = {"$gte": min_amount}
@@ -222,7 +418,19 @@ def search_transactions_by_fields(db,
         query["merchant"] = merchant
     if date:
         start = datetime(date.year, date.month, date.day)
-        end = start.replace(day=start.day + 1)
+        end = start + timedelta(days=1)
         query["timestamp"] = {"$gte": start, "$lt": end}
+    return query
+
 
-    return list(db.transactions.find(query))
+def search_transactions_by_fields(db,
+                                  min_amount: Optional[float] = None,
+                                  merchant: Optional[str] = None,
+                                  date: Optional[datetime] = None,
+                                  projection: Projection = None,
+                                  page_size: Optional[int] = None,
+                                  cursor: Optional[str] = None,
+                                  raw: bool = False):
+
+    query = _fields_query(min_amount, merchant, date)
+    return _find_list(_collection(db, "transactions", raw), query, projection, page_size, cursor)
@@ -0,0 +1,180 @@
+"""
+Mongo/mongo_rollup.py
+Mantiene los totales precalculados por cuenta y día / mes.
+
+- daily_account_totals:   {account_id, day, total_amount, count, updated_at}
+- monthly_account_totals: {account_id, month, total_amount, count, updated_at}
+
+Cada ejecución procesa solo las transacciones ingeridas desde la marca
+de agua guardada en rollup_state (campo ingested_at). Los (cuenta, día)
+afectados se recalculan completos desde transactions y se escriben con
+$merge (whenMatched: replace), así que volver a ejecutar tras una falla
+no duplica montos. Luego se recalculan los meses de esos días a partir
+de daily_account_totals.
+
+updated_at indica hasta qué ingested_at cubre cada documento; las
+lecturas de mongo_queries suman lo ingerido después directamente de
+transactions.
+
+Uso:
+
+    python -m Mongo.mongo_rollup
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+
+ROLLUP_STATE_ID = "account_totals"
+
+# Margen para no cerrar la ventana sobre escrituras aún en vuelo
+# (ingested_at se asigna en el cliente antes de insertar)
+DEFAULT_LAG = timedelta(seconds=60)
+
+
+def get_watermark(db) -> Optional[datetime]:
+    state = db.rollup_state.find_one({"_id": ROLLUP_STATE_ID})
+    return state["watermark"] if state else None
+
+
+def _set_watermark(db, watermark: datetime) -> None:
+    db.rollup_state.update_one(
+        {"_id": ROLLUP_STATE_ID},
+        {"$set": {"watermark": watermark, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def daily_rollup_pipeline(since: Optional[datetime], until: datetime) -> List[Dict[str, Any]]:
+    """
+    Recalcula los (cuenta, día) con transacciones ingeridas en
+    [since, until) y los escribe en daily_account_totals. En la primera
+    ejecución (since None) se incluyen también los documentos sin
+    ingested_at.
+    """
+    if since is None:
+        window = {"ingested_at": {"$not": {"$gte": until}}}
+    else:
+        window = {"ingested_at": {"$gte": since, "$lt": until}}
+
+    return [
+        {"$match": {**window, "timestamp": {"$type": "date"}}},
+        {"$group": {"_id": {
+            "account_id": "$account_id",
+            "day": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}}
+        }}},
+        {"$lookup": {
+            "from": "transactions",
+            "localField": "_id.account_id",
+            "foreignField": "account_id",
+            "let": {"day": "$_id.day"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$gte": ["$timestamp", "$$day"]},
+                    {"$lt": ["$timestamp", {"$dateAdd": {"startDate": "$$day", "unit": "day", "amount": 1}}]},
+                    {"$not": [{"$gte": ["$ingested_at", until]}]}
+                ]}}},
+                {"$group": {"_id": None, "total_amount": {"$sum": "$amount"}, "count": {"$sum": 1}}}
+            ],
+            "as": "totals"
+        }},
+        {"$unwind": "$totals"},
+        {"$project": {
+            "_id": 0,
+            "account_id": "$_id.account_id",
+            "day": "$_id.day",
+            "total_amount": "$totals.total_amount",
+            "count": "$totals.count",
+            "updated_at": {"$literal": until}
+        }},
+        {"$merge": {
+            "into": "daily_account_totals",
+            "on": ["account_id", "day"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+
+def monthly_rollup_pipeline(until: datetime) -> List[Dict[str, Any]]:
+    """
+    Recalcula los meses de los días escritos por la última pasada diaria
+    (updated_at == until) sumando daily_account_totals.
+    """
+    return [
+        {"$match": {"updated_at": until}},
+        {"$group": {"_id": {
+            "account_id": "$account_id",
+            "month": {"$dateTrunc": {"date": "$day", "unit": "month"}}
+        }}},
+        {"$lookup": {
+            "from": "daily_account_totals",
+            "localField": "_id.account_id",
+            "foreignField": "account_id",
+            "let": {"month": "$_id.month"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$gte": ["$day", "$$month"]},
+                    {"$lt": ["$day", {"$dateAdd": {"startDate": "$$month", "unit": "month", "amount": 1}}]}
+                ]}}},
+                {"$group": {"_id": None, "total_amount": {"$sum": "$total_amount"}, "count": {"$sum": "$count"}}}
+            ],
+            "as": "totals"
+        }},
+        {"$unwind": "$totals"},
+        {"$project": {
+            "_id": 0,
+            "account_id": "$_id.account_id",
+            "month": "$_id.month",
+            "total_amount": "$totals.total_amount",
+            "count": "$totals.count",
+            "updated_at": {"$literal": until}
+        }},
+        {"$merge": {
+            "into": "monthly_account_totals",
+            "on": ["account_id", "month"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+
+def run_rollup(db, lag: timedelta = DEFAULT_LAG, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Procesa lo ingerido desde la marca de agua hasta now - lag y avanza
+    la marca. Devuelve la ventana procesada y los documentos escritos.
+    """
+    since = get_watermark(db)
+    until = (now or datetime.utcnow()) - lag
+    if since is not None and until <= since:
+        return {"since": since, "until": since, "days": 0, "months": 0}
+
+    db.transactions.aggregate(daily_rollup_pipeline(since, until))
+    db.daily_account_totals.aggregate(monthly_rollup_pipeline(until))
+    _set_watermark(db, until)
+
+    return {
+        "since": since,
+        "until": until,
+        "days": db.daily_account_totals.count_documents({"updated_at": until}),
+        "months": db.monthly_account_totals.count_documents({"updated_at": until})
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Actualiza daily_account_totals y monthly_account_totals desde la marca de agua."
+    )
+    parser.add_argument("--lag", type=int, default=int(DEFAULT_LAG.total_seconds()),
+                        help="Segundos que se dejan sin procesar (escrituras en vuelo)")
+    args = parser.parse_args()
+
+    from connect import get_mongo_db
+    result = run_rollup(get_mongo_db(), lag=timedelta(seconds=args.lag))
+    print(f"Ventana {result['since']} -> {result['until']}: "
+          f"{result['days']} días y {result['months']} meses actualizados")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,55 @@ mongo_setup.py
 Script para crear las colecciones de MongoDB 
 
 Colecciones:
-- customers
-- accounts
+- users, user_access (time-series con expiración)
+- clients
+- accounts, operations
 - transactions (metadata)
+- daily_account_totals, monthly_account_totals, rollup_state
+- setup_state (avance de las migraciones de este script)
 """
 
-from pymongo import MongoClient, ASCENDING, TEXT
+import os
+from datetime import datetime, timedelta
 
-MONGO_URI = "mongodb://localhost:27017"
-DB_NAME = "fraud_detection"
+from typing import Any, Dict, List
 
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import BulkWriteError
 
-def get_mongo_client(uri: str = MONGO_URI) -> MongoClient:
-    """Crea y devuelve un cliente de MongoDB."""
-    return MongoClient(uri)
+# URI, nombre de la base y cliente compartido vienen del registro
+from Mongo.mongo_client import DB_NAME, get_mongo_client
+
+
+# Colecciones que usa Mongo/mongo_queries.py
+COLLECTIONS = [
+    "users", "user_access", "clients", "accounts", "operations", "transactions",
+    "daily_account_totals", "monthly_account_totals", "rollup_state", "setup_state"
+]
+
+# user_access es una colección time-series: los accesos se agrupan por
+# usuario (metaField) y se borran solos pasado el plazo de retención
+USER_ACCESS_TTL_DAYS = int(os.getenv("MONGO_USER_ACCESS_TTL_DAYS", "365"))
+
+USER_ACCESS_OPTIONS = {
+    "timeseries": {"timeField": "timestamp", "metaField": "user_id", "granularity": "hours"},
+    "expireAfterSeconds": USER_ACCESS_TTL_DAYS * 24 * 3600,
+}
+
+# Migración de un user_access normal (versiones anteriores); su avance se
+# guarda en setup_state con este _id
+USER_ACCESS_LEGACY = "user_access_legacy"
+USER_ACCESS_MIGRATION = "user_access_timeseries"
+MAX_SKIPPED_IDS = 100
+
+# Índices de versiones anteriores que ya no corresponden a ninguna consulta
+# (o que se reemplazaron por una versión con otras opciones)
+OBSOLETE_INDEXES = {
+    "accounts": ["idx_accounts_account_number_unique", "idx_accounts_customer_id"],
+    "transactions": [
+        "idx_transactions_account", "idx_transactions_merchant", "idx_transactions_timestamp"
+    ],
+}
 
 
 def create_collections(db):
@@ -29,44 +64,250 @@ def create_collections(db):
 
     existing = db.list_collection_names()
 
-    if "customers" not in existing:
-        db.create_collection("customers")
+    for name in COLLECTIONS:
+        if name == "user_access":
+            continue
+        if name not in existing:
+            db.create_collection(name)
+
+    create_user_access_collection(db)
+
 
-    if "accounts" not in existing:
-        db.create_collection("accounts")
+def _is_timeseries(db, name: str) -> bool:
+    info = next(db.list_collections(filter={"name": name}), None)
+    return info is not None and info.get("type") == "timeseries"
 
-    if "transactions" not in existing:
-        db.create_collection("transactions")
+
+def create_user_access_collection(db, batch_size: int = 1000):
+    """
+    Crea user_access como colección time-series con expiración. Si ya
+    existe como colección normal (versiones anteriores) se renombra a
+    user_access_legacy, se crea la nueva y se copian los accesos que aún
+    están dentro del plazo de retención (ver migrate_user_access).
+
+    Si user_access es una colección normal y user_access_legacy ya existe
+    (p. ej. una versión anterior de log_user_access volvió a crear
+    user_access después de migrar) no se renombra ni se registra nada:
+    se lanza RuntimeError para que se revise a mano cuál de las dos
+    conservar.
+    """
+    existing = db.list_collection_names()
+
+    if "user_access" in existing and _is_timeseries(db, "user_access"):
+        db.command("collMod", "user_access",
+                   expireAfterSeconds=USER_ACCESS_OPTIONS["expireAfterSeconds"])
+    else:
+        if "user_access" in existing:
+            if USER_ACCESS_LEGACY in existing:
+                state = db.setup_state.find_one({"_id": USER_ACCESS_MIGRATION}) or {}
+                raise RuntimeError(
+                    f"user_access no es time-series y {USER_ACCESS_LEGACY} ya existe "
+                    f"(migración anterior: {'terminada' if state.get('done') else 'sin terminar'}). "
+                    f"Copia o elimina {USER_ACCESS_LEGACY} y vuelve a ejecutar el setup"
+                )
+            # El estado se registra antes de renombrar (una falla entre ambos
+            # pasos no deja la copia sin hacer)
+            _set_setup_state(db, USER_ACCESS_MIGRATION, done=False, last_id=None, copied=0, skipped=0)
+            db.user_access.rename(USER_ACCESS_LEGACY)
+        db.create_collection("user_access", **USER_ACCESS_OPTIONS)
+
+    # La migración termina cuando su estado lo dice, no cuando user_access
+    # ya es time-series: una corrida interrumpida continúa aquí
+    state = db.setup_state.find_one({"_id": USER_ACCESS_MIGRATION})
+    if state is not None and not state.get("done") and USER_ACCESS_LEGACY in db.list_collection_names():
+        migrate_user_access(db, batch_size)
+
+
+def _set_setup_state(db, state_id: str, **fields):
+    db.setup_state.update_one(
+        {"_id": state_id},
+        {"$set": {**fields, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def migrate_user_access(db, batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Copia a user_access los accesos de user_access_legacy dentro del plazo
+    de retención, en orden de _id y por lotes. Después de cada lote se
+    guarda el último _id en setup_state, así una corrida interrumpida
+    continúa desde ahí. Los documentos que la colección time-series
+    rechaza (p. ej. timestamp que no es fecha) se omiten y se cuentan en
+    "skipped" (con algunos _id de ejemplo en "skipped_ids").
+
+    Una corrida que se cayó entre insert_many y el checkpoint deja su
+    último lote ya copiado, y las colecciones time-series no impiden _id
+    repetidos. Por eso en el primer lote de cada corrida se omiten los _id
+    que ya están en user_access.
+    """
+    state = db.setup_state.find_one({"_id": USER_ACCESS_MIGRATION}) or {}
+    last_id = state.get("last_id")
+    copied = state.get("copied", 0)
+    skipped = state.get("skipped", 0)
+    skipped_ids = list(state.get("skipped_ids", []))
+
+    cutoff = datetime.utcnow() - timedelta(days=USER_ACCESS_TTL_DAYS)
+    query: Dict[str, Any] = {"timestamp": {"$gte": cutoff}}
+    if last_id is not None:
+        query["_id"] = {"$gt": last_id}
+
+    def already_copied(docs: List[Dict[str, Any]]) -> set:
+        # user_id y el rango de timestamp acotan la búsqueda al índice
+        timestamps = [doc["timestamp"] for doc in docs]
+        found = db.user_access.find({
+            "user_id": {"$in": [doc.get("user_id") for doc in docs]},
+            "timestamp": {"$gte": min(timestamps), "$lte": max(timestamps)},
+            "_id": {"$in": [doc["_id"] for doc in docs]},
+        }, {"_id": 1})
+        return {doc["_id"] for doc in found}
+
+    first = True
+
+    def flush(batch: List[Dict[str, Any]]):
+        nonlocal copied, skipped, first
+        valid = [doc for doc in batch if isinstance(doc.get("timestamp"), datetime)]
+        rejected = [doc["_id"] for doc in batch if not isinstance(doc.get("timestamp"), datetime)]
+        if valid and first:
+            present = already_copied(valid)
+            copied += len(present)
+            valid = [doc for doc in valid if doc["_id"] not in present]
+        first = False
+        if valid:
+            try:
+                copied += len(db.user_access.insert_many(valid, ordered=False).inserted_ids)
+            except BulkWriteError as e:
+                copied += e.details.get("nInserted", 0)
+                rejected += [valid[error["index"]]["_id"] for error in e.details.get("writeErrors", [])]
+        skipped += len(rejected)
+        skipped_ids.extend(rejected[:MAX_SKIPPED_IDS - len(skipped_ids)])
+        _set_setup_state(db, USER_ACCESS_MIGRATION, done=False, last_id=batch[-1]["_id"],
+                         copied=copied, skipped=skipped, skipped_ids=skipped_ids)
+
+    batch = []
+    for doc in db[USER_ACCESS_LEGACY].find(query).sort("_id", ASCENDING):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    _set_setup_state(db, USER_ACCESS_MIGRATION, done=True, copied=copied, skipped=skipped)
+    print(f"user_access migrada a time-series: {copied} accesos copiados, {skipped} omitidos "
+          f"(original en {USER_ACCESS_LEGACY}).")
+    return {"copied": copied, "skipped": skipped, "skipped_ids": skipped_ids}
+
+
+def drop_obsolete_indexes(db):
+    """
+    Elimina los índices de OBSOLETE_INDEXES que aún existan.
+    """
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = db[collection].index_information()
+        for name in names:
+            if name in existing:
+                db[collection].drop_index(name)
+
+
+def find_duplicates(collection, keys, match=None, limit=10):
+    """
+    Valores repetidos de `keys` (lista de campos) que impedirían crear un
+    índice único. Devuelve [{"_id": {campo: valor}, "count": n, "example_id": _id}].
+    """
+    pipeline = [{"$match": match}] if match else []
+    pipeline += [
+        {"$group": {
+            "_id": {field: f"${field}" for field in keys},
+            "count": {"$sum": 1},
+            "example_id": {"$first": "$_id"}
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit}
+    ]
+    return list(collection.aggregate(pipeline, allowDiskUse=True))
+
+
+def create_unique_index(collection, keys, name: str, **kwargs) -> bool:
+    """
+    Crea el índice único `name` si no hay duplicados. Si los hay, los
+    reporta y no crea el índice (se puede volver a ejecutar tras
+    limpiarlos). Devuelve True si el índice existe al terminar.
+    """
+    if name in collection.index_information():
+        return True
+
+    fields = [field for field, _direction in keys]
+    duplicates = find_duplicates(collection, fields, kwargs.get("partialFilterExpression"))
+    if duplicates:
+        print(f"No se creó {name} en {collection.name}: hay valores repetidos de {', '.join(fields)}")
+        for duplicate in duplicates:
+            print(f"  {duplicate['_id']}: {duplicate['count']} documentos (p. ej. _id {duplicate['example_id']})")
+        return False
+
+    collection.create_index(keys, unique=True, name=name, **kwargs)
+    return True
 
 
 def create_indexes(db):
     """
-    Crea los índices necesarios en cada colección según los
-    requerimientos del proyecto.
+    Crea los índices de cada colección. Cada índice corresponde a la
+    forma de una consulta de Mongo/mongo_queries.py (filtros de igualdad
+    primero, luego orden / rangos). Los índices de listas terminan en _id
+    para que el orden por (timestamp, _id) sea estable.
+    Mongo/mongo_plan_check.py verifica que ninguna consulta termine en
+    COLLSCAN. Los índices únicos no se crean si ya hay duplicados (ver
+    create_unique_index).
     """
 
+    drop_obsolete_indexes(db)
+
+    # ================================================================
+    # USERS / USER_ACCESS
+    # ================================================================
+
+    # find_user_by_email
+    create_unique_index(
+        db.users,
+        [("email", ASCENDING)],
+        name="idx_users_email_unique"
+    )
+
+    # get_user_access_log: accesos de un usuario por rango de fechas
+    # (user_access es time-series: el índice va sobre metaField + timeField)
+    db.user_access.create_index(
+        [("user_id", ASCENDING), ("timestamp", DESCENDING)],
+        name="idx_user_access_user_ts"
+    )
+
+
     # ================================================================
-    # CUSTOMERS
+    # CLIENTS
     # ================================================================
-    customers = db.customers
+    clients = db.clients
 
-    # Email único – identificación del cliente
-    customers.create_index(
+    # Email único – identificación del cliente (search_client_by_identifier)
+    create_unique_index(
+        clients,
         [("email", ASCENDING)],
-        unique=True,
-        name="idx_customers_email_unique"
+        name="idx_clients_email_unique"
+    )
+
+    # CURP (segunda rama del $or de search_client_by_identifier)
+    clients.create_index(
+        [("curp", ASCENDING)],
+        name="idx_clients_curp"
     )
 
     # País -> segmentación de clientes
-    customers.create_index(
+    clients.create_index(
         [("country", ASCENDING)],
-        name="idx_customers_country"
+        name="idx_clients_country"
     )
 
     # Índice para buscar clientes por nombre
-    customers.create_index(
+    clients.create_index(
         [("name", TEXT)],
-        name="idx_customers_name_text"
+        name="idx_clients_name_text"
     )
 
 
@@ -75,17 +316,19 @@ def create_indexes(db):
     # ================================================================
     accounts = db.accounts
 
-    # Número de cuenta único
-    accounts.create_index(
+    # Número de cuenta único; create_account no lo asigna, así que el
+    # índice solo cubre las cuentas que lo tienen
+    create_unique_index(
+        accounts,
         [("account_number", ASCENDING)],
-        unique=True,
-        name="idx_accounts_account_number_unique"
+        partialFilterExpression={"account_number": {"$exists": True}},
+        name="idx_accounts_account_number_unique_partial"
     )
 
     # Relación cliente → cuentas del cliente
     accounts.create_index(
-        [("customer_id", ASCENDING)],
-        name="idx_accounts_customer_id"
+        [("client_id", ASCENDING)],
+        name="idx_accounts_client_id"
     )
 
     # Tipo de cuenta (débito, crédito, etc.)
@@ -95,27 +338,58 @@ def create_indexes(db):
     )
 
 
+    # ================================================================
+    # OPERATIONS
+    # ================================================================
+
+    # get_account_operations: operaciones de la cuenta, más recientes primero
+    db.operations.create_index(
+        [("account_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+        name="idx_operations_account_timestamp_id"
+    )
+
+
     # ================================================================
     # TRANSACTIONS (metadatos)
     # ================================================================
     transactions = db.transactions
 
-    # Acceso rápido a transacciones por cuenta
+    # get_daily_totals / monthly_totals_per_account: cuenta + rango de fechas
+    # (y search_transactions solo por cuenta)
     transactions.create_index(
-        [("account_number", ASCENDING)],
-        name="idx_transactions_account"
+        [("account_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+        name="idx_transactions_account_timestamp_id"
     )
 
-    # Filtros por rango de fechas (metadata)
+    # search_transactions con cuenta + comercio + estado
     transactions.create_index(
-        [("timestamp", ASCENDING)],
-        name="idx_transactions_timestamp"
+        [("account_id", ASCENDING), ("merchant", ASCENDING), ("status", ASCENDING),
+         ("timestamp", ASCENDING), ("_id", ASCENDING)],
+        name="idx_transactions_account_merchant_status_timestamp_id"
     )
 
-    # Búsquedas por tipo de comercio o categoria
+    # search_transactions / search_transactions_by_fields por comercio (+ fecha)
     transactions.create_index(
-        [("merchant", ASCENDING)],
-        name="idx_transactions_merchant"
+        [("merchant", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+        name="idx_transactions_merchant_timestamp_id"
+    )
+
+    # search_transactions solo por estado (p. ej. todas las DECLINED)
+    transactions.create_index(
+        [("status", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)],
+        name="idx_transactions_status_timestamp_id"
+    )
+
+    # search_transactions_by_fields solo por monto mínimo
+    transactions.create_index(
+        [("amount", ASCENDING)],
+        name="idx_transactions_amount"
+    )
+
+    # Filtros solo por rango de fechas (metadata)
+    transactions.create_index(
+        [("timestamp", ASCENDING), ("_id", ASCENDING)],
+        name="idx_transactions_timestamp_id"
     )
 
     # Índice de texto en descripción (opcional)
@@ -124,10 +398,45 @@ def create_indexes(db):
         name="idx_transactions_description_text"
     )
 
+    # Ventana de ingesta del rollup (Mongo/mongo_rollup.py)
+    transactions.create_index(
+        [("ingested_at", ASCENDING)],
+        name="idx_transactions_ingested_at"
+    )
+
+    # Delta de una cuenta no cubierto por el rollup (ingested_at reciente)
+    transactions.create_index(
+        [("account_id", ASCENDING), ("ingested_at", ASCENDING), ("timestamp", ASCENDING)],
+        name="idx_transactions_account_ingested_timestamp"
+    )
+
+
+    # ================================================================
+    # ROLLUPS (daily_account_totals / monthly_account_totals)
+    # ================================================================
+
+    # Lectura por (cuenta, día) y clave del $merge
+    create_unique_index(
+        db.daily_account_totals,
+        [("account_id", ASCENDING), ("day", ASCENDING)],
+        name="idx_daily_account_totals_account_day_unique"
+    )
+
+    # Días reescritos en la última pasada (entrada del rollup mensual)
+    db.daily_account_totals.create_index(
+        [("updated_at", ASCENDING)],
+        name="idx_daily_account_totals_updated_at"
+    )
+
+    create_unique_index(
+        db.monthly_account_totals,
+        [("account_id", ASCENDING), ("month", ASCENDING)],
+        name="idx_monthly_account_totals_account_month_unique"
+    )
+
 
 def main():
-    client = get_mongo_client()
-    db = client[DB_NAME]
+    db = get_mongo_client()[DB_NAME]
 
     print(f"Conectado a MongoDB, base de datos: {DB_NAME}")
 
@@ -137,9 +446,6 @@ def main():
     create_indexes(db)
     print("Índices creados / verificados.")
 
-    client.close()
-    print("Conexión cerrada.")
-
 
 if __name__ == "__main__":
     main()
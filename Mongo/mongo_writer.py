@@ -0,0 +1,158 @@
+"""
+Mongo/mongo_writer.py
+Escritura por lotes de metadatos de transacciones.
+
+En lugar de un insert_one por transacción, TransactionMetadataWriter
+acumula los documentos y los envía con insert_many(ordered=False) cuando
+se junta batch_size documentos o pasan flush_interval segundos desde el
+primero pendiente. Un documento rechazado (p. ej. _id duplicado) no
+detiene al resto del lote: se pasa a on_error si se da y, si no, se
+guarda en `errors`. `failed` cuenta los rechazados en ambos casos.
+
+    with TransactionMetadataWriter(db, batch_size=1000) as writer:
+        for tx in txs:
+            writer.add(tx)
+    # al salir del with se envía lo pendiente
+
+Se puede compartir entre hilos.
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+
+class TransactionMetadataWriter:
+    """
+    Buffer de documentos para la colección de transacciones (ver el
+    docstring del módulo).
+    """
+
+    def __init__(self, db,
+                 batch_size: int = 500,
+                 flush_interval: Optional[float] = 1.0,
+                 on_error: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None,
+                 collection: str = "transactions"):
+        self.collection = db[collection]
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_error = on_error
+
+        self.inserted = 0
+        self.failed = 0
+        # Solo sin on_error: con callback el llamador decide qué conservar
+        self.errors: List[Dict[str, Any]] = []
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        # Un solo insert_many a la vez por writer
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        self._timer = None
+        if flush_interval:
+            self._timer = threading.Thread(target=self._flush_periodically, daemon=True,
+                                           name="TransactionMetadataWriter")
+            self._timer.start()
+
+    def add(self, tx_data: Dict[str, Any]) -> None:
+        """
+        Agrega una copia del documento (con ingested_at) al buffer; no
+        modifica el dict recibido.
+        """
+        if self._closed.is_set():
+            raise RuntimeError("TransactionMetadataWriter cerrado")
+
+        document = dict(tx_data)
+        document["ingested_at"] = datetime.utcnow()
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(document)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def add_many(self, txs) -> None:
+        for tx_data in txs:
+            self.add(tx_data)
+
+    def flush(self) -> int:
+        """
+        Envía todo lo pendiente. Devuelve cuántos documentos se insertaron.
+        """
+        inserted = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._buffer[:self.batch_size]
+                    del self._buffer[:self.batch_size]
+                    self._oldest = time.monotonic() if self._buffer else None
+                if not batch:
+                    return inserted
+                inserted += self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> int:
+        try:
+            result = self.collection.insert_many(batch, ordered=False)
+            count = len(result.inserted_ids)
+            failures = []
+        except BulkWriteError as e:
+            count = e.details.get("nInserted", 0)
+            failures = [
+                (batch[error["index"]], {"code": error.get("code"), "errmsg": error.get("errmsg")})
+                for error in e.details.get("writeErrors", [])
+            ]
+        except PyMongoError as e:
+            # Error del lote completo (red, timeout, ...): se reporta cada documento
+            count = 0
+            failures = [(document, {"code": None, "errmsg": str(e)}) for document in batch]
+
+        with self._lock:
+            self.inserted += count
+            self.failed += len(failures)
+            if self.on_error is None:
+                for document, error in failures:
+                    self.errors.append({"document": document, **error})
+
+        if self.on_error is not None:
+            for document, error in failures:
+                try:
+                    self.on_error(document, error)
+                except Exception as e:
+                    print(f"Error en on_error de TransactionMetadataWriter: {e}")
+        return count
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval / 2):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Error en flush periódico de TransactionMetadataWriter: {e}")
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def close(self) -> None:
+        """
+        Envía lo pendiente y detiene el flush periódico.
+        """
+        self._closed.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
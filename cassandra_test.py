@@ -1,10 +1,11 @@
+import asyncio
 import json
 import uuid
 import os
 from datetime import datetime, timedelta, date
 
 # Conexión
-from connect import get_cassandra_session
+from connect import bootstrap_cassandra, get_cassandra_session
 
 # Tus queries
 from Cassandra.cassandra_queries import (
@@ -14,8 +15,18 @@ from Cassandra.cassandra_queries import (
     get_daily_totals,
     insert_alert,
     get_alerts_by_account,
-    get_latest_alerts
+    get_latest_alerts,
+    get_transaction_payload,
+    get_transactions_by_ids,
+    get_recent_transactions_many,
+    get_daily_totals_many,
+    get_merchant_daily_totals,
+    page_recent_transactions
 )
+from Cassandra.cassandra_bulk import insert_transactions_bulk
+from Cassandra import cassandra_aio
+from Cassandra.cassandra_latency import get_recent_transactions_slo
+from Cassandra.cassandra_cache import DailyTotalsCache
 
 # ============================
 #  CARGA DE PARÁMETROS DE PRUEBA
@@ -82,7 +93,9 @@ def run_tests():
     print("    PRUEBAS DE CASSANDRA - FINANZAS")
     print("=======================================\n")
 
-    cluster, session = get_cassandra_session()
+    # Crea el keyspace y las tablas si no existen (clúster nuevo)
+    bootstrap_cassandra()
+    _cluster, session = get_cassandra_session()
 
     if not session:
         print("❌ No se pudo conectar a Cassandra.")
@@ -173,9 +186,125 @@ def run_tests():
         print("Ejemplo:", res[0])
     print("")
 
-    # Cerrar
-    session.shutdown()
-    cluster.shutdown()
+    # -------------------------------------
+    # REQ 8 – Carga masiva de transacciones
+    # -------------------------------------
+    print("--- [Req 8] Carga masiva de transacciones ---")
+    rows = [
+        {
+            "account_number": p["account_number"],
+            "amount": p["amount"] + i,
+            "currency": p["currency"],
+            "merchant": p["merchant"],
+            "status": p["status"],
+        }
+        for i in range(50)
+    ]
+    rows.append({"account_number": p["account_number"], "amount": 10})  # fila inválida
+    res = insert_transactions_bulk(session, rows)
+    print(f"Insertadas: {res['inserted']}  Fallidas: {len(res['failed'])}")
+    if res["failed"]:
+        print("Ejemplo de error:", res["failed"][0]["error"])
+    print("")
+
+    # -------------------------------------
+    # REQ 9 – Paginación reanudable
+    # -------------------------------------
+    print("--- [Req 9] Transacciones recientes por páginas ---")
+    page, state = page_recent_transactions(session, p["account_number"], page_size=20)
+    pages = 1
+    while state and pages < 3:
+        page, state = page_recent_transactions(
+            session, p["account_number"], page_size=20, paging_state=state
+        )
+        pages += 1
+    print(f"Páginas leídas: {pages}  Filas en la última: {len(page)}")
+    print("")
+
+    # -------------------------------------
+    # REQ 10 – Consultas asyncio concurrentes
+    # -------------------------------------
+    print("--- [Req 10] Consultas asyncio ---")
+
+    async def concurrent_lookups():
+        return await asyncio.gather(*[
+            cassandra_aio.get_recent_transactions(session, p["account_number"], limit=5)
+            for _ in range(20)
+        ])
+
+    res = asyncio.run(concurrent_lookups())
+    print(f"Consultas concurrentes: {len(res)}  Filas en la primera: {len(res[0])}")
+    print("")
+
+    # -------------------------------------
+    # REQ 11 – Payload comprimido bajo demanda
+    # -------------------------------------
+    print("--- [Req 11] Payload de la transacción ---")
+    payload = json.dumps({"network": "VISA", "fields": {str(i): "x" * 20 for i in range(50)}})
+    res = insert_transaction(
+        session,
+        p["account_number"],
+        p["amount"],
+        p["currency"],
+        p["merchant"],
+        p["status"],
+        raw_payload=payload
+    )
+    stored = get_transaction_payload(session, res["transaction_id"]) if res else None
+    print("Payload recuperado íntegro:", stored == payload, "\n")
+
+    # -------------------------------------
+    # REQ 12 – Lectura con plazo (SLO de latencia)
+    # -------------------------------------
+    print("--- [Req 12] Transacciones recientes con plazo de 50 ms ---")
+    res = get_recent_transactions_slo(session, p["account_number"], deadline=0.05)
+    print("Resultado:", res, "\n")
+
+    # -------------------------------------
+    # REQ 13 – Resolver transacciones por id
+    # -------------------------------------
+    print("--- [Req 13] Transacciones por transaction_id ---")
+    recent = get_recent_transactions(session, p["account_number"], limit=5)
+    res = get_transactions_by_ids(session, [tx["transaction_id"] for tx in recent])
+    print(f"Resueltas: {sum(1 for tx in res.values() if tx)} de {len(res)}\n")
+
+    # -------------------------------------
+    # REQ 14 – Lecturas de muchas cuentas
+    # -------------------------------------
+    print("--- [Req 14] Lecturas de muchas cuentas ---")
+    accounts = [p["account_number"], "ACC00000"]
+    recent, errors = get_recent_transactions_many(session, accounts, limit=5)
+    for acct, rows in recent.items():
+        print(f"{acct}: {len(rows)} transacciones recientes")
+    totals, errors = get_daily_totals_many(session, accounts, p["test_day"])
+    for acct, total in totals.items():
+        print(f"{acct}: {total}")
+    print(f"Errores: {errors}")
+    days = [p["test_day"] - timedelta(days=offset) for offset in range(3)]
+    totals, errors = get_daily_totals_many(session, accounts, days)
+    print(f"Totales (cuenta, día) en {len(days)} días: {len(totals)}  Errores: {len(errors)}\n")
+
+    # -------------------------------------
+    # REQ 15 – Caché de totales diarios
+    # -------------------------------------
+    print("--- [Req 15] Caché de totales diarios ---")
+    cache = DailyTotalsCache(max_entries=1000)
+    for _ in range(3):
+        cache.get_daily_totals(session, p["account_number"], p["test_day"])
+    print(f"Estadísticas: {cache.stats()}\n")
+    cache.close()
+
+    # -------------------------------------
+    # REQ 16 – Totales diarios por comercio
+    # -------------------------------------
+    print("--- [Req 16] Totales diarios por comercio ---")
+    series = get_merchant_daily_totals(session, p["merchant"], p["test_day"], p["test_day"])
+    for day in series:
+        print(f"{day['date']}: {day['total_amount']} en {day['transaction_count']} transacciones, "
+              f"por estado: {day['by_status']}")
+    print()
+
+    # La sesión compartida se cierra al salir del proceso (connect.shutdown_cassandra)
 
     print("=======================================")
     print("        PRUEBAS COMPLETADAS")
@@ -1,52 +1,118 @@
+import atexit
 import os
+import threading
 
-from pymongo import MongoClient
-from cassandra.cluster import Cluster
+from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT, NoHostAvailable
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
 import pydgraph
-from Mongo.mongo_setup import get_mongo_client
+from Mongo.mongo_client import DB_NAME as MONGO_DB_NAME, get_mongo_client
 
 # Mongo
 def get_mongo_db():
     """
-    Regresa el objeto de base de datos de MongoDB para el proyecto.
+    Regresa el objeto de base de datos de MongoDB para el proyecto
+    (MONGO_DB_NAME) sobre el cliente compartido del proceso.
 
     Usa la variable de entorno MONGO_URI si existe,
-    en otro caso se conecta a localhost.
+    en otro caso se conecta a localhost. Ver Mongo/mongo_client.py.
     """
-    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-    client = MongoClient(mongo_uri)
-    db = client["finance"]  # mismo nombre que en mongo_setup
-    return db
+    return get_mongo_client()[MONGO_DB_NAME]
 
 # Cassandra
-# En connect.py
+# Una sola sesión por proceso: el Cluster se configura una vez (balanceo
+# token-aware) y se reutiliza en cada llamada. Crear el keyspace ya no es
+# un efecto secundario de conectarse: en un clúster nuevo hay que ejecutar
+# antes bootstrap_cassandra() (o python -m Cassandra.cassandra_setup), si
+# no get_cassandra_session falla porque el keyspace no existe.
+# cassandra_test.py y la carga masiva (Cassandra.cassandra_bulk) lo llaman
+# al iniciar.
 
-def get_cassandra_session():
-    # 1. Obtener host (con fallback a localhost para evitar el error anterior)
-    cassandra_host = os.getenv("CASSANDRA_HOST", "localhost")
-    # Nombre de tu base de datos (Keyspace)
-    keyspace = "finance" 
+CASSANDRA_KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "finance")
 
-    cluster = Cluster([cassandra_host])
-    session = cluster.connect() # Conecta al clúster sin seleccionar keyspace aún
+_cassandra = {"pid": None, "cluster": None, "session": None}
+_cassandra_lock = threading.Lock()
 
-    # 2. Crear el Keyspace si no existe (Autorreparación)
-    # Esto es vital por si borraste el contenedor y está vacío
-    try:
-        session.execute(f"""
-            CREATE KEYSPACE IF NOT EXISTS {keyspace}
-            WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': 1}}
-        """)
-    except Exception as e:
-        print(f"Advertencia al crear keyspace: {e}")
 
-    # 3. USAR el Keyspace (Esto soluciona tu error actual)
-    session.set_keyspace(keyspace)
+def _build_cassandra_cluster():
+    # CASSANDRA_HOST admite varios nodos separados por coma
+    hosts = os.getenv("CASSANDRA_HOST", "localhost").split(",")
+    # Sin CASSANDRA_LOCAL_DC el driver usa el DC del primer nodo contactado
+    local_dc = os.getenv("CASSANDRA_LOCAL_DC")
 
-    print(f"Conectado a Cassandra en {cassandra_host} usando keyspace '{keyspace}'")
+    profile = ExecutionProfile(
+        load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy(local_dc=local_dc))
+    )
+    return Cluster(hosts, execution_profiles={EXEC_PROFILE_DEFAULT: profile})
 
+
+def get_cassandra_cluster():
+    """
+    Devuelve el Cluster compartido del proceso (sin abrir sesión).
+    Después de un fork el proceso hijo crea el suyo: el driver no
+    es seguro entre procesos.
+    """
+    with _cassandra_lock:
+        if _cassandra["cluster"] is None or _cassandra["pid"] != os.getpid():
+            _cassandra.update(pid=os.getpid(), cluster=_build_cassandra_cluster(), session=None)
+        return _cassandra["cluster"]
+
+
+def get_cassandra_session():
+    """
+    Devuelve (cluster, session) compartidos por todo el proceso, conectados
+    al keyspace CASSANDRA_KEYSPACE. Solo la primera llamada abre conexiones.
+    El keyspace debe existir (ver bootstrap_cassandra).
+    """
+    cluster = get_cassandra_cluster()
+    with _cassandra_lock:
+        session = _cassandra["session"]
+        if session is None or session.is_shutdown:
+            try:
+                session = cluster.connect(CASSANDRA_KEYSPACE)
+            except NoHostAvailable as e:
+                # El driver no distingue "keyspace inexistente" de "nodos
+                # caídos": si la conexión de control sí cargó el esquema y
+                # el keyspace no está, el problema es el bootstrap
+                keyspaces = cluster.metadata.keyspaces
+                if keyspaces and CASSANDRA_KEYSPACE not in keyspaces:
+                    raise RuntimeError(
+                        f"El keyspace '{CASSANDRA_KEYSPACE}' no existe. "
+                        f"En un clúster nuevo ejecuta antes bootstrap_cassandra() "
+                        f"o python -m Cassandra.cassandra_setup"
+                    ) from e
+                raise
+            _cassandra["session"] = session
+            print(f"Conectado a Cassandra en {', '.join(map(str, cluster.contact_points))} "
+                  f"usando keyspace '{CASSANDRA_KEYSPACE}'")
     return cluster, session
 
+
+def bootstrap_cassandra():
+    """
+    Paso explícito de inicialización: crea el keyspace (si no existe) y las
+    tablas. Se ejecuta una vez por despliegue, no en cada conexión.
+    """
+    from Cassandra.cassandra_setup import create_keyspace, create_tables
+
+    session = get_cassandra_cluster().connect()
+    try:
+        create_keyspace(session, CASSANDRA_KEYSPACE)
+        session.set_keyspace(CASSANDRA_KEYSPACE)
+        create_tables(session)
+    finally:
+        session.shutdown()
+
+
+@atexit.register
+def shutdown_cassandra():
+    """
+    Cierra la sesión y el Cluster compartidos (se llama al salir).
+    """
+    with _cassandra_lock:
+        if _cassandra["pid"] == os.getpid() and _cassandra["cluster"] is not None:
+            _cassandra["cluster"].shutdown()
+        _cassandra.update(pid=None, cluster=None, session=None)
+
 # Dgraph
 def get_dgraph_client():
     DGRAPH_URI = os.getenv('DGRAPH_URI', 'localhost:9080')
@@ -62,21 +128,22 @@ def get_dgraph_client():
 def main():
     mongo_client = None
     cassandra_cluster = None
-    cassandra_session = None
     dgraph_client = None
     dgraph_stub = None
 
     print("=== Probando conexiones a las bases de datos ===")
 
-    # Mongo
+    # Mongo (el cliente compartido se cierra al salir del proceso)
     try:
         mongo_client = get_mongo_client()
+        mongo_client.admin.command("ping")
+        print(f"Conectado a MongoDB, base de datos: {MONGO_DB_NAME}")
     except Exception as e:
         print(f"No se pudo conectar a MongoDB: {e}")
 
     # Cassandra
     try:
-        cassandra_cluster, cassandra_session = get_cassandra_session()
+        cassandra_cluster, _session = get_cassandra_session()
     except Exception as e:
         print(f"No se pudo conectar a Cassandra: {e}")
 
@@ -89,13 +156,8 @@ def main():
     print("=== Finalizó la prueba de conexiones ===")
 
     # Cierre de conexiones
-    if mongo_client:
-        mongo_client.close()
-
-    if cassandra_session:
-        cassandra_session.shutdown()
     if cassandra_cluster:
-        cassandra_cluster.shutdown()
+        shutdown_cassandra()
 
     if dgraph_stub:
         dgraph_stub.close()
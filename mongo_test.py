@@ -1,8 +1,14 @@
+import asyncio
+import io
 from datetime import datetime, timedelta
 from bson import ObjectId
 
 from connect import get_mongo_db
 from Mongo import mongo_queries as q
+from Mongo.mongo_writer import TransactionMetadataWriter
+from Mongo.mongo_rollup import run_rollup
+from Mongo import mongo_aio as aq
+from Mongo.mongo_client import close_async_mongo_clients, get_async_mongo_db
 
 
 # ================================================================
@@ -11,6 +17,11 @@ from Mongo import mongo_queries as q
 db = get_mongo_db()
 print("Conectado a MongoDB\n")
 
+# Emails únicos por ejecución (users.email y clients.email tienen índice único)
+RUN_ID = str(ObjectId())
+USER_EMAIL = f"test+{RUN_ID}@example.com"
+CLIENT_EMAIL = f"cliente+{RUN_ID}@correo.com"
+
 
 # ================================================================
 # REQ 1: Crear y consultar usuarios
@@ -19,13 +30,13 @@ print("=== PRUEBA REQ 1: Crear usuario y obtener por email ===")
 u = q.create_user(
     db,
     name="Test User",
-    email="test@example.com",
+    email=USER_EMAIL,
     password_hash="HASH123",
     role="admin"
 )
 print("Usuario creado:", u.inserted_id)
 
-user = q.find_user_by_email(db, "test@example.com")
+user = q.find_user_by_email(db, USER_EMAIL)
 print("Usuario encontrado:", user, "\n")
 
 
@@ -37,7 +48,7 @@ print("=== PRUEBA REQ 2: Log de accesos ===")
 q.log_user_access(db, str(user["_id"]))
 q.log_user_access(db, str(user["_id"]))
 
-access_log = q.get_user_access_log(db, str(user["_id"]))
+access_log = q.get_user_access_log(db, str(user["_id"]), limit=q.ACCESS_LOG_LIMIT)
 print("Accesos registrados:", len(access_log))
 print(access_log, "\n")
 
@@ -49,7 +60,7 @@ print("=== PRUEBA REQ 3: CRUD clientes ===")
 
 client_id = q.create_client(db, {
     "name": "Cliente Prueba",
-    "email": "cliente@correo.com",
+    "email": CLIENT_EMAIL,
     "curp": "ABCD123456XXXXXX",
     "country": "Mexico"
 }).inserted_id
@@ -62,7 +73,7 @@ q.update_client(db, str(client_id), {"country": "USA"})
 print("Cliente actualizado:", q.get_client(db, str(client_id)))
 
 print("Buscar por email/curp:",
-      q.search_client_by_identifier(db, "cliente@correo.com"))
+      q.search_client_by_identifier(db, CLIENT_EMAIL))
 
 # No eliminamos para que quede como dato base para la siguiente prueba
 print("")
@@ -172,4 +183,104 @@ print(q.search_transactions_by_fields(
 ))
 print("\n")
 
+# ================================================================
+# REQ 11: Escritura por lotes de metadata de transacciones
+# ================================================================
+print("=== PRUEBA REQ 11: TransactionMetadataWriter ===")
+
+with TransactionMetadataWriter(db, batch_size=50) as writer:
+    for i in range(120):
+        writer.add({
+            "account_id": str(acc_id),
+            "amount": 10.0 + i,
+            "merchant": "Amazon",
+            "status": "APPROVED",
+            "timestamp": datetime.utcnow()
+        })
+
+print("Insertadas:", writer.inserted, "Errores:", len(writer.errors))
+print("\n")
+
+# ================================================================
+# REQ 12: Rollups diarios / mensuales
+# ================================================================
+print("=== PRUEBA REQ 12: run_rollup + totales desde rollups ===")
+
+print("Rollup:", run_rollup(db, lag=timedelta(0)))
+print("Diario:", q.get_daily_totals(db, str(acc_id), today))
+print("Mensual:", q.monthly_totals_per_account(db, str(acc_id), today.year, today.month))
+print("\n")
+
+# ================================================================
+# REQ 13: Paginación por keyset con proyección
+# ================================================================
+print("=== PRUEBA REQ 13: search_transactions paginado ===")
+
+cursor = None
+pages = 0
+while True:
+    page, cursor = q.search_transactions(
+        db,
+        account_id=str(acc_id),
+        projection=["amount", "merchant"],
+        page_size=25,
+        cursor=cursor
+    )
+    pages += 1
+    print(f"Página {pages}: {len(page)} transacciones")
+    if cursor is None:
+        break
+print("\n")
+
+# ================================================================
+# REQ 14: Lectura RawBSON y volcado sin recodificar
+# ================================================================
+print("=== PRUEBA REQ 14: search_transactions(raw=True) ===")
+
+raw_docs = q.search_transactions(db, account_id=str(acc_id), raw=True)
+if raw_docs:
+    print("Primer documento (solo monto decodificado):", raw_docs[0]["amount"])
+
+buffer = io.BytesIO()
+print("Documentos volcados:", q.dump_raw_documents(raw_docs, buffer), "bytes:", buffer.tell())
+print("\n")
+
+# ================================================================
+# REQ 15: Consultas asíncronas (AsyncMongoClient)
+# ================================================================
+print("=== PRUEBA REQ 15: mongo_aio ===")
+
+
+async def async_checks():
+    adb = get_async_mongo_db()
+    account, txs, totals = await asyncio.gather(
+        aq.get_account(adb, str(acc_id)),
+        aq.search_transactions(adb, account_id=str(acc_id)),
+        aq.get_daily_totals(adb, str(acc_id), today)
+    )
+    print("Cuenta:", account["_id"] if account else None)
+    print("Transacciones:", len(txs), "Totales del día:", totals)
+
+    ops = [op async for op in aq.iter_account_operations(adb, str(acc_id))]
+    print("Operaciones (cursor asíncrono):", len(ops))
+    await close_async_mongo_clients()
+
+
+asyncio.run(async_checks())
+print("\n")
+
+# ================================================================
+# REQ 16: Log de accesos acotado por fechas (time-series)
+# ================================================================
+print("=== PRUEBA REQ 16: get_user_access_log con rango y límite ===")
+
+recent_access = q.get_user_access_log(
+    db,
+    str(user["_id"]),
+    start=datetime.utcnow() - timedelta(days=7),
+    limit=10
+)
+print("Accesos de los últimos 7 días:", len(recent_access))
+print("\n")
+
 print("=== PRUEBAS COMPLETADAS ===")